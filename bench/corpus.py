@@ -0,0 +1,174 @@
+"""Synthetic Markdown corpora for benchmarking the generator."""
+
+import os
+import random
+
+WORDS = (
+    "elf hobbit ring shire wizard river mountain forest dragon king road "
+    "tower sword song star ship harbour lore age council gate"
+).split()
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def paragraph(rng, length=60):
+    return words(rng, length).capitalize() + "."
+
+
+def link_dense_paragraph(rng, links=20):
+    parts = []
+    for i in range(links):
+        parts.append(words(rng, 3))
+        if i % 5 == 4:
+            parts.append(f"![{words(rng, 2)}](/images/{i}.png)")
+        else:
+            parts.append(f"[{words(rng, 2)}](/pages/{rng.randrange(10000)})")
+    return " ".join(parts)
+
+
+def emphasis_dense_paragraph(rng, spans=30):
+    parts = []
+    for i in range(spans):
+        word = words(rng, 2)
+        parts.append(("**{}**", "*{}*", "`{}`", "_{}_")[i % 4].format(word))
+        parts.append(words(rng, 2))
+    return " ".join(parts)
+
+
+def long_list(rng, items=200, ordered=False):
+    lines = []
+    for i in range(items):
+        marker = f"{i + 1}." if ordered else "-"
+        lines.append(f"{marker} {words(rng, 6)} **{words(rng, 1)}**")
+    return "\n".join(lines)
+
+
+def code_block(rng, lines=20):
+    return "```\n" + "\n".join(words(rng, 8) for _ in range(lines)) + "\n```"
+
+
+def page(rng, title, blocks):
+    return "\n\n".join([f"# {title}", *blocks]) + "\n"
+
+
+def small_page(rng):
+    return page(
+        rng,
+        words(rng, 4),
+        [
+            paragraph(rng),
+            f"## {words(rng, 3)}",
+            long_list(rng, 5),
+            f"> {paragraph(rng, 20)}",
+            paragraph(rng, 30) + f" [more](/pages/{rng.randrange(100)})",
+        ],
+    )
+
+
+def huge_page(rng, sections=400):
+    blocks = []
+    for i in range(sections):
+        blocks.append(f"## {words(rng, 3)} {i}")
+        blocks.append(paragraph(rng, 120))
+        blocks.append(emphasis_dense_paragraph(rng, 8))
+        if i % 4 == 0:
+            blocks.append(code_block(rng))
+        if i % 5 == 0:
+            blocks.append(long_list(rng, 10, ordered=True))
+    return page(rng, "Huge page", blocks)
+
+
+def link_dense_page(rng, paragraphs=40):
+    return page(
+        rng, "Links", [link_dense_paragraph(rng, 50) for _ in range(paragraphs)]
+    )
+
+
+def reference_page(rng, paragraphs=8):
+    return page(
+        rng,
+        "Reference",
+        [link_dense_paragraph(rng, 400) for _ in range(paragraphs)],
+    )
+
+
+def emphasis_dense_page(rng, paragraphs=40):
+    return page(
+        rng, "Emphasis", [emphasis_dense_paragraph(rng, 60) for _ in range(paragraphs)]
+    )
+
+
+def list_page(rng, lists=10):
+    return page(
+        rng,
+        "Lists",
+        [long_list(rng, 500, ordered=i % 2 == 1) for i in range(lists)],
+    )
+
+
+# shape -> (page generator, page count at scale 1)
+SHAPES = {
+    "small": (small_page, 2000),
+    "huge": (huge_page, 3),
+    "links": (link_dense_page, 50),
+    "references": (reference_page, 20),
+    "emphasis": (emphasis_dense_page, 50),
+    "lists": (list_page, 20),
+}
+
+
+def unmatched_brackets(n):
+    return "# Brackets\n\n" + "[" * n + "\n\n" + "![a](" * n + "\n\n" + "](" * n
+
+
+def huge_list(n):
+    items = "\n".join(f"- item {i} with [a link](/{i})" for i in range(n))
+    return "# List\n\n" + items + "\n\n" + "\n".join(f"{i}. x" for i in range(n))
+
+
+def repeated_delimiters(n):
+    return (
+        "# Delimiters\n\n"
+        + "**" * n
+        + "\n\n"
+        + "*_`" * n
+        + "\n\n"
+        + "**a " * n
+        + "\n\n"
+        + "> **quote\n" * n
+    )
+
+
+def unclosed_fence(n):
+    return "# Fence\n\n```\n" + "code\n\n" * n
+
+
+# name -> (adversarial page generator, size at scale 1)
+PATHOLOGICAL = {
+    "unmatched_brackets": (unmatched_brackets, 10_000),
+    "huge_list": (huge_list, 100_000),
+    "repeated_delimiters": (repeated_delimiters, 20_000),
+    "unclosed_fence": (unclosed_fence, 50_000),
+}
+
+
+def generate_pages(shape, scale=1.0, seed=0):
+    """Yield (relative path, markdown) pairs for a corpus of the given shape."""
+    make_page, count = SHAPES[shape]
+    rng = random.Random(seed)
+    for i in range(max(1, int(count * scale))):
+        yield os.path.join(shape, f"{i // 100:03d}", f"{i:05d}.md"), make_page(rng)
+
+
+def write_corpus(root, shape, scale=1.0, seed=0):
+    """Write a corpus under `root` and return the number of pages written."""
+    count = 0
+    for rel_path, markdown in generate_pages(shape, scale, seed):
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(markdown)
+        count += 1
+    return count
@@ -0,0 +1,288 @@
+"""Benchmark harness.
+
+    python3 bench/run.py                 # run everything at scale 1
+    python3 bench/run.py --scale 0.1     # smaller corpora
+    python3 bench/run.py --only inline   # benchmarks whose name contains "inline"
+    python3 bench/run.py --save          # record results as the baseline
+
+Results are compared against bench/baseline.json when it exists.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import corpus  # noqa: E402
+import inline_markdown  # noqa: E402
+from build import build_site, page_urls, stream_body, write_page  # noqa: E402
+from cache import BlockCache, DiskStore  # noqa: E402
+from template import Template  # noqa: E402
+from inline_markdown import (  # noqa: E402
+    markdown_to_blocks,
+    markdown_to_html,
+    markdown_to_html_string,
+    text_to_textnodes,
+)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BENCHMARKS = {}
+# Quadrupling a pathological input may cost at most this many times more.
+MAX_SCALING = 6.0
+FAILURES = []
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+
+    return register
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_pages(shape, scale):
+    return [markdown for _, markdown in corpus.generate_pages(shape, scale)]
+
+
+def parse_benchmarks(shape):
+    def run(scale, repeat):
+        pages = load_pages(shape, scale)
+        blocks = [block for page in pages for block in markdown_to_blocks(page)]
+        nodes = [markdown_to_html(page) for page in pages]
+        tmp = tempfile.TemporaryDirectory()
+
+        def render_cached(warm):
+            """Render every page through a block cache on disk, as
+            --block-cache-db does, filled by a previous build or empty."""
+            path = os.path.join(tmp.name, "warm.sqlite" if warm else "cold.sqlite")
+            if not warm and os.path.exists(path):
+                os.remove(path)
+            cache = BlockCache(10000, DiskStore(path))
+            for page in pages:
+                markdown_to_html_string(page, cache=cache)
+                cache.flush()
+            cache.store.close()
+
+        render_cached(warm=True)
+        results = {
+            "text_to_textnodes": best_of(
+                lambda: [text_to_textnodes(block) for block in blocks], repeat
+            ),
+            "markdown_to_html": best_of(
+                lambda: [markdown_to_html(page) for page in pages], repeat
+            ),
+            "to_html": best_of(lambda: [node.to_html() for node in nodes], repeat),
+            "markdown_to_html_string": best_of(
+                lambda: [markdown_to_html_string(page) for page in pages], repeat
+            ),
+            "block_cache_cold": best_of(lambda: render_cached(False), repeat),
+            "block_cache_warm": best_of(lambda: render_cached(True), repeat),
+        }
+        tmp.cleanup()
+        return results
+
+    return run
+
+
+for _shape in corpus.SHAPES:
+    benchmark(f"parse/{_shape}")(parse_benchmarks(_shape))
+
+
+def verbatim(value):
+    return value
+
+
+@contextlib.contextmanager
+def unescaped_rendering():
+    """Render text and attribute values verbatim, as before escaping was added.
+
+    Only the escaping calls are replaced; the checks for characters to escape
+    made before them still run.
+    """
+    names = ("escape_text", "escape_attr", "attr")
+    saved = [getattr(inline_markdown, name) for name in names]
+    for name in names:
+        setattr(inline_markdown, name, verbatim)
+    try:
+        yield
+    finally:
+        for name, fn in zip(names, saved):
+            setattr(inline_markdown, name, fn)
+
+
+@benchmark("render/escaping")
+def render_escaping(scale, repeat):
+    """markdown_to_html_string with and without escaping on link- and
+    emphasis-dense pages, plus the same pages sprinkled with `&`, `<` and `>`."""
+    pages = load_pages("links", scale) + load_pages("emphasis", scale)
+    unsafe = [
+        page.replace("ring ", "ring & ").replace("king", "<king>") for page in pages
+    ]
+
+    def render(pages):
+        return lambda: [markdown_to_html_string(page) for page in pages]
+
+    results = {
+        "escaped": best_of(render(pages), repeat),
+        "unsafe_escaped": best_of(render(unsafe), repeat),
+    }
+    with unescaped_rendering():
+        results["unescaped"] = best_of(render(pages), repeat)
+        results["unsafe_unescaped"] = best_of(render(unsafe), repeat)
+    return results
+
+
+def pathological_benchmark(name):
+    make_page, size = corpus.PATHOLOGICAL[name]
+
+    def run(scale, repeat):
+        """Render an adversarial page at a quarter and at full size, degrading
+        malformed blocks as builds do, and check the time grows linearly."""
+        n = max(1000, int(size * scale))
+        small, large = make_page(n // 4), make_page(n)
+        small_time = best_of(lambda: markdown_to_html_string(small, errors=[]), repeat)
+        large_time = best_of(lambda: markdown_to_html_string(large, errors=[]), repeat)
+        scaling = large_time / small_time
+        if scaling > MAX_SCALING:
+            FAILURES.append(f"pathological/{name}: 4x input took {scaling:.1f}x time")
+        return {"quarter": small_time, "full": large_time, "scaling_ratio": scaling}
+
+    return run
+
+
+for _name in corpus.PATHOLOGICAL:
+    benchmark(f"pathological/{_name}")(pathological_benchmark(_name))
+
+
+@benchmark("memory/huge")
+def memory_huge(scale, repeat):
+    """Memory held by the parsed trees of the huge pages and their allocations,
+    and the peak while writing one rendered to a string or streamed."""
+    pages = load_pages("huge", scale)
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    trees = [markdown_to_html(page) for page in pages]
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    del trees
+
+    def peak_of(fn):
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+    string_peak = stream_peak = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        dest_path = os.path.join(tmp, "index.html")
+        for page in pages:
+
+            def write_string():
+                html = markdown_to_html_string(page)
+                write_page(dest_path, template, {"Title": "", "Content": html})
+
+            def write_stream():
+                content = stream_body(page, page_urls("/"))[0]
+                write_page(dest_path, template, {"Title": "", "Content": content})
+
+            string_peak = max(string_peak, peak_of(write_string))
+            stream_peak = max(stream_peak, peak_of(write_stream))
+    return {
+        "tree_retained_kib": retained / 1024,
+        "tree_peak_kib": peak / 1024,
+        "tree_retained_blocks": retained_blocks,
+        "write_string_peak_kib": string_peak / 1024,
+        "write_stream_peak_kib": stream_peak / 1024,
+    }
+
+
+@benchmark("build/small")
+def build_small(scale, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, "content")
+        corpus.write_corpus(content, "small", scale)
+        dest = os.path.join(tmp, "docs")
+        template = os.path.join(ROOT, "template.html")
+        static = os.path.join(ROOT, "static")
+
+        def build(**kwargs):
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_site("/", content, static, template, dest, **kwargs)
+
+        return {
+            "full": best_of(build, repeat),
+            "full_jobs": best_of(lambda: build(jobs=os.cpu_count()), repeat),
+            "full_io_threads": best_of(lambda: build(io_threads=4), repeat),
+            "incremental_unchanged": best_of(
+                lambda: build(incremental=True), repeat
+            ),
+        }
+
+
+def compare(results, baseline):
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            change = f"{(value - old) / old * 100:+7.1f}%" if old else ""
+            if metric.endswith(("_kib", "_blocks", "_ratio")):
+                digits = 2 if metric.endswith("_ratio") else 0
+                print(f"{name:<20} {metric:<24} {value:10.{digits}f}    {change}")
+            else:
+                print(f"{name:<20} {metric:<24} {value * 1000:10.2f} ms {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if args.only in name:
+            results[name] = fn(args.scale, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    compare(results, baseline.get("results", {}))
+
+    if args.save:
+        merged = {**baseline.get("results", {}), **results}
+        baseline = {"scale": args.scale, "results": merged}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+    if FAILURES:
+        sys.exit("\n".join(["Superlinear scaling:", *FAILURES]))
+
+
+if __name__ == "__main__":
+    main()
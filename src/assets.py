@@ -0,0 +1,135 @@
+import json
+import os
+from manifest import file_hash
+from scan import scan_tree
+
+ASSET_MANIFEST = "asset-manifest.json"
+FINGERPRINT_LENGTH = 10
+
+
+def fingerprinted_path(rel_path, digest):
+    """`index.css` becomes `index.<hash>.css`."""
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def site_path(rel_path):
+    return "/" + rel_path.replace(os.sep, "/")
+
+
+class AssetHashes:
+    """Content hashes of static files, reused while a file's size and mtime
+    are unchanged.
+
+    Stored as JSON next to the destination directory, e.g. `docs` keeps
+    `.docs-assets.json`, which full builds leave in place.
+    """
+
+    def __init__(self, path, files: dict | None = None):
+        self.path = path
+        self.files = files if files is not None else {}
+        self.hashed = 0
+
+    @staticmethod
+    def path_for(dest_dir):
+        parent, name = os.path.split(os.path.normpath(dest_dir))
+        return os.path.join(parent, f".{name}-assets.json")
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                return cls(path, json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.files, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def update(self, static_dir, files=None):
+        """Hash the files under `static_dir`, given by a scan_tree of it when
+        the caller has one, and return the previous hashes."""
+        previous = self.files
+        self.files = {}
+        files = scan_tree(static_dir) if files is None else files
+        for rel_path, (size, mtime_ns, _) in files.items():
+            entry = previous.get(rel_path)
+            if entry is None or entry[:2] != [size, mtime_ns]:
+                src_path = os.path.join(static_dir, rel_path)
+                entry = [size, mtime_ns, file_hash(src_path)]
+                self.hashed += 1
+            self.files[rel_path] = entry
+        return previous
+
+
+def fingerprint_assets(static_dir, dest_dir, link=False, files=None):
+    """Give every static file a content-addressed copy in `dest_dir`.
+
+    Writes `asset-manifest.json` mapping site paths such as `/index.css` to
+    their copies and returns that mapping with (copied, unchanged, removed,
+    hashed) counts. Copies made for older versions of a file are removed.
+    `files` is a scan_tree of `static_dir` when the caller already has one.
+    """
+    from site_index import write_atomic
+    from sync import copy_file
+
+    hashes = AssetHashes.load(AssetHashes.path_for(dest_dir))
+    previous = hashes.update(static_dir, files)
+    assets = {}
+    copied = unchanged = removed = 0
+    for rel_path, (_, _, digest) in sorted(hashes.files.items()):
+        dest_rel_path = fingerprinted_path(rel_path, digest)
+        dest_path = os.path.join(dest_dir, dest_rel_path)
+        if os.path.exists(dest_path):
+            unchanged += 1
+        else:
+            copy_file(os.path.join(static_dir, rel_path), dest_path, link)
+            copied += 1
+        assets[site_path(rel_path)] = site_path(dest_rel_path)
+
+    current = set(assets.values())
+    for rel_path, (_, _, digest) in previous.items():
+        dest_rel_path = fingerprinted_path(rel_path, digest)
+        dest_path = os.path.join(dest_dir, dest_rel_path)
+        if site_path(dest_rel_path) not in current and os.path.exists(dest_path):
+            os.remove(dest_path)
+            removed += 1
+    hashes.save()
+    write_atomic(
+        os.path.join(dest_dir, ASSET_MANIFEST),
+        [json.dumps(assets, indent=1, sort_keys=True)],
+    )
+    return assets, (copied, unchanged, removed, hashes.hashed)
+
+
+def remove_fingerprints(dest_dir, keep=()):
+    """Remove `asset-manifest.json` and the copies made by the last
+    fingerprint_assets from `dest_dir`, except the paths in `keep` (static
+    files synced there under the same name). Returns how many copies were
+    removed.
+    """
+    manifest_path = os.path.join(dest_dir, ASSET_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return 0
+    hashes = AssetHashes.load(AssetHashes.path_for(dest_dir))
+    removed = 0
+    for rel_path, (_, _, digest) in hashes.files.items():
+        dest_rel_path = fingerprinted_path(rel_path, digest)
+        dest_path = os.path.join(dest_dir, dest_rel_path)
+        if dest_rel_path not in keep and os.path.exists(dest_path):
+            os.remove(dest_path)
+            removed += 1
+    os.remove(manifest_path)
+    return removed
+
+
+def read_asset_manifest(dest_dir):
+    """Return the mapping written by the last fingerprinted build, if any."""
+    try:
+        with open(os.path.join(dest_dir, ASSET_MANIFEST), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
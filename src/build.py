@@ -0,0 +1,912 @@
+from collections import Counter, deque
+from contextlib import ExitStack
+import hashlib
+import inline_markdown
+from htmlnode import LeafNode, ParentNode, escape_text
+from inline_markdown import (
+    PARSER_VERSION,
+    RenderTimeout,
+    iter_lines,
+    iter_markdown_html,
+    markdown_to_html_string,
+)
+from profiling import NullProfiler
+from template import load_template
+from urls import UrlResolver
+import os
+import time
+
+DEST_DIR = "docs"
+PIPELINE_DEPTH = 16
+
+
+class BuildError(Exception):
+    pass
+
+
+CACHE_DIR = ".cache"
+PAGE_CACHE_DB = os.path.join(CACHE_DIR, "pages.sqlite")
+# Bump whenever the shape of page cache values changes.
+PAGE_CACHE_FORMAT = 2
+
+_block_cache = None
+_page_cache = None
+_cache_config = (0, None, None, 0)
+_assets = None
+_limits = (0, 0, False)
+_render_stats = Counter()
+
+
+def configure_caches(
+    block_cache_size=0, block_cache_db=None, page_cache_db=None, page_cache_bytes=0
+):
+    """Set up this process's caches.
+
+    A `block_cache_size` of 0 disables the block cache and a missing
+    `page_cache_db` disables the page cache.
+    """
+    global _block_cache, _page_cache, _cache_config
+    _cache_config = (
+        block_cache_size,
+        block_cache_db,
+        page_cache_db,
+        page_cache_bytes,
+    )
+    _block_cache = None
+    _page_cache = None
+    if block_cache_size > 0 or page_cache_db:
+        from cache import BlockCache, DiskStore, PageCache
+    if block_cache_size > 0:
+        store = DiskStore(block_cache_db) if block_cache_db else None
+        _block_cache = BlockCache(block_cache_size, store)
+    if page_cache_db:
+        _page_cache = PageCache(page_cache_db, page_cache_bytes)
+
+
+def configure_assets(assets):
+    """Point static file URLs in pages rendered by this process at the
+    fingerprinted copies in `assets`, or at the originals when None."""
+    global _assets
+    _assets = assets
+
+
+def configure_limits(max_page_chars=0, max_page_seconds=0, strict=False):
+    """Bound the work spent on one page in this process.
+
+    Pages longer than `max_page_chars` characters, or still rendering after
+    `max_page_seconds` (checked between blocks), are published as escaped
+    plain text, as are blocks that cannot be parsed, and pages without a
+    `# ` heading get DEFAULT_TITLE; with `strict`, the latter two fail the
+    page instead. 0 disables a limit.
+    """
+    global _limits
+    _limits = (max_page_chars, max_page_seconds, strict)
+
+
+def init_worker(cache_config, assets, limits):
+    configure_caches(*cache_config)
+    configure_assets(assets)
+    configure_limits(*limits)
+
+
+def page_urls(basepath):
+    return UrlResolver(basepath, _assets)
+
+
+def render_settings():
+    """What besides a page's inputs decides its output, as stored in the
+    manifest: the parser version and this process's page limits."""
+    return [PARSER_VERSION, *_limits]
+
+
+def page_cache_key(markdown, urls):
+    key = f"{PARSER_VERSION}\0{PAGE_CACHE_FORMAT}\0{urls.key}\0{markdown}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+def copy_content(src="static", dst=DEST_DIR):
+    import shutil
+    from scan import scan_tree, tree_order
+
+    os.makedirs(dst, exist_ok=True)
+    for rel_path in sorted(scan_tree(src), key=tree_order):
+        dst_path = os.path.join(dst, rel_path)
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        shutil.copy2(os.path.join(src, rel_path), dst_path)
+
+
+DEFAULT_TITLE = "Untitled"
+
+
+def extract_title(markdown):
+    for line in iter_lines(markdown):
+        if line.startswith("# "):
+            return line.lstrip("# ").strip()
+    raise ValueError("No h1 header found in markdown file")
+
+
+def split_front_matter(markdown):
+    """Split a leading `---` delimited block of `key: value` lines off `markdown`."""
+    if not markdown.startswith("---\n"):
+        return {}, markdown
+    end = markdown.find("\n---\n", 3)
+    if end == -1:
+        return {}, markdown
+    meta = {}
+    for line in markdown[4:end].split("\n"):
+        key, sep, value = line.partition(":")
+        if sep:
+            meta[key.strip()] = value.strip()
+    return meta, markdown[end + 5 :]
+
+
+def page_template_path(meta, template_path):
+    """Resolve the template chosen by front matter relative to the default one.
+
+    Front matter is written by page authors, so a template that is absolute
+    or resolves outside the default template's directory raises ValueError.
+    """
+    if "template" not in meta:
+        return template_path
+    template_dir = os.path.dirname(template_path)
+    path = os.path.join(template_dir, meta["template"])
+    root = os.path.realpath(template_dir)
+    if os.path.isabs(meta["template"]) or os.path.commonpath(
+        [root, os.path.realpath(path)]
+    ) != root:
+        raise ValueError(f"template {meta['template']!r} is outside {root}")
+    return path
+
+
+def generate_page(
+    basepath, from_path, template_path, dest_path, profiler=None, collect_text=False
+):
+    page_stats, page_template, page = render_page(
+        basepath, from_path, template_path, dest_path, profiler, collect_text
+    )
+    print(f"Generating page from {from_path} to {dest_path} using {page_template}")
+    return page_stats, page
+
+
+def read_page(from_path):
+    with open(from_path, "r") as f:
+        return split_front_matter(f.read())
+
+
+def write_output(dest_path, html):
+    """Atomically replace `dest_path`, dropping its now stale `.gz` sibling."""
+    from compress import remove_sibling
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(html)
+    os.replace(tmp_path, dest_path)
+    remove_sibling(dest_path)
+
+
+def write_page(dest_path, template, values):
+    """Stream `template` rendered with `values` into `dest_path`, leaving no
+    partial output behind when rendering fails; see write_output."""
+    from compress import remove_sibling
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            template.write(f, values)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dest_path)
+    remove_sibling(dest_path)
+
+
+def take_cache_stats():
+    stats = take_render_stats()
+    for cache in (_block_cache, _page_cache):
+        if cache is not None:
+            cache.flush()
+            stats.update(cache.take_stats())
+    return stats
+
+
+def take_render_stats():
+    """Return and reset the counts of pages and blocks degraded to plain text."""
+    stats = dict(_render_stats)
+    _render_stats.clear()
+    return stats
+
+
+def warn_degraded(src_path, stats):
+    if stats.get("oversized_pages"):
+        print(f"warning: {src_path} is over the size limit, published as plain text")
+    if stats.get("slow_pages"):
+        print(f"warning: {src_path} is over the time limit, published as plain text")
+    if stats.get("untitled_pages"):
+        print(f"warning: {src_path} has no # heading, published as {DEFAULT_TITLE!r}")
+    if stats.get("malformed_blocks"):
+        print(
+            f"warning: {src_path} has {stats['malformed_blocks']} malformed blocks, "
+            "published as plain text"
+        )
+
+
+def plain_page_html(markdown):
+    return f"<div><pre>{escape_text(markdown)}</pre></div>"
+
+
+def degraded_body(markdown, plain, reason, stats):
+    """Count a page published as plain text in `stats` and return its body,
+    making the Markdown its plaintext."""
+    stats[reason] += 1
+    if plain is not None:
+        plain[:] = [markdown]
+    return plain_page_html(markdown)
+
+
+def page_title(markdown, stats, strict):
+    """extract_title, or None for a page without a heading unless strict."""
+    try:
+        return extract_title(markdown)
+    except ValueError:
+        if strict:
+            raise
+        stats["untitled_pages"] += 1
+        return None
+
+
+def page_deadline(max_seconds):
+    return time.perf_counter() + max_seconds if max_seconds else None
+
+
+def render_body(
+    markdown, urls, profiler, collect_text=False, caches=True, stats=None, limits=None
+):
+    """Return the page body, its title and, with `collect_text` or a page
+    cache, its plaintext.
+
+    The caches hold SQLite connections of the thread that configured them
+    and the render stats and limits are this process's, so renders on other
+    threads pass `caches=False` and a `stats` Counter and `limits` tuple
+    (as for configure_limits) of their own.
+    """
+    block_cache = _block_cache if caches else None
+    page_cache = _page_cache if caches else None
+    stats = _render_stats if stats is None else stats
+    max_chars, max_seconds, strict = _limits if limits is None else limits
+    key = None
+    if page_cache is not None:
+        with profiler.stage("page_cache"):
+            key = page_cache_key(markdown, urls)
+            cached = page_cache.get(key)
+        if cached is not None:
+            return cached
+
+    plain = [] if collect_text or key is not None else None
+    errors = None if strict else []
+    degraded = True
+    with profiler.stage("markdown_to_html"):
+        if max_chars and len(markdown) > max_chars:
+            html_content = degraded_body(markdown, plain, "oversized_pages", stats)
+        else:
+            try:
+                html_content = markdown_to_html_string(
+                    markdown,
+                    urls,
+                    block_cache,
+                    plain,
+                    errors,
+                    page_deadline(max_seconds),
+                )
+            except RenderTimeout:
+                html_content = degraded_body(markdown, plain, "slow_pages", stats)
+            else:
+                degraded = bool(errors)
+                if errors:
+                    stats["malformed_blocks"] += len(errors)
+    with profiler.stage("extract_title"):
+        title = page_title(markdown, stats, strict)
+    text = "\n".join(plain) if plain is not None else None
+    # Degraded pages are rendered again so that every build warns about them.
+    if key is not None and not degraded and title is not None:
+        page_cache.put(key, (html_content, title, text))
+    return html_content, DEFAULT_TITLE if title is None else title, text
+
+
+def stream_body(markdown, urls, collect_text=False):
+    """render_body without a page cache, returning the body as an iterator of
+    fragments rendered as it is consumed and the list its plaintext is
+    collected in, so a large page is never held as one string.
+
+    The iterator raises RenderTimeout past the time limit; the consumer then
+    publishes degraded_body instead, as render_page does.
+    """
+    max_chars, max_seconds, strict = _limits
+    plain = [] if collect_text else None
+    title = page_title(markdown, _render_stats, strict)
+    title = DEFAULT_TITLE if title is None else title
+    if max_chars and len(markdown) > max_chars:
+        body = degraded_body(markdown, plain, "oversized_pages", _render_stats)
+        return body, title, plain
+    errors = None if strict else []
+
+    def fragments():
+        yield from iter_markdown_html(
+            markdown, urls, _block_cache, plain, errors, page_deadline(max_seconds)
+        )
+        if errors:
+            _render_stats["malformed_blocks"] += len(errors)
+
+    return fragments(), title, plain
+
+
+def render_to_string(
+    meta,
+    markdown,
+    template_path,
+    urls,
+    collect_text=False,
+    caches=True,
+    stats=None,
+    limits=None,
+):
+    """Render a page split by read_page to a string; return it, its title
+    and its plaintext. See render_body for `caches`, `stats` and `limits`."""
+    template = load_template(page_template_path(meta, template_path), urls)
+    content, title, text = render_body(
+        markdown, urls, NullProfiler(), collect_text, caches, stats, limits
+    )
+    html = template.render({"Title": escape_text(title), "Content": content})
+    return html, title, text
+
+
+def render_page(
+    basepath, from_path, template_path, dest_path, profiler=None, collect_text=False
+):
+    """Render one page and return the cache counters it accumulated, the
+    template it used and, with `collect_text`, its (title, plaintext)."""
+    profiler = profiler or NullProfiler()
+    with profiler.page(from_path):
+        with profiler.stage("read"):
+            meta, markdown_content = read_page(from_path)
+
+        urls = page_urls(basepath)
+        page_template = page_template_path(meta, template_path)
+        with profiler.stage("load_template"):
+            template = load_template(page_template, urls)
+
+        if not profiler.enabled and _page_cache is None:
+            content, title, plain = stream_body(markdown_content, urls, collect_text)
+            values = {"Title": escape_text(title), "Content": content}
+            try:
+                write_page(dest_path, template, values)
+            except RenderTimeout:
+                values["Content"] = degraded_body(
+                    markdown_content, plain, "slow_pages", _render_stats
+                )
+                write_page(dest_path, template, values)
+            text = "\n".join(plain) if collect_text else None
+        else:
+            # The page cache needs the body as a string, and rendering up
+            # front times templating and I/O apart.
+            content, title, text = render_body(
+                markdown_content, urls, profiler, collect_text
+            )
+            values = {"Title": escape_text(title), "Content": content}
+            with profiler.stage("template"):
+                final_html = template.render(values)
+            with profiler.stage("write"):
+                write_output(dest_path, final_html)
+
+    return take_cache_stats(), page_template, (title, text) if collect_text else None
+
+
+def collect_pages(dir_path_content, dest_dir_path, files=None):
+    """Return (source, dest) pairs for the Markdown files under the content
+    directory in depth-first name order. `files` is a scan_tree of its
+    `.md` files when the caller already has one."""
+    from scan import scan_tree, tree_order
+
+    if files is None:
+        files = scan_tree(dir_path_content, ".md")
+    return [
+        (
+            os.path.join(dir_path_content, rel_path),
+            os.path.join(dest_dir_path, os.path.splitext(rel_path)[0] + ".html"),
+        )
+        for rel_path in sorted(files, key=tree_order)
+    ]
+
+
+def generate_pages_pipelined(
+    basepath, pages, template_path, io_threads, stats, index=None
+):
+    """Render pages in this thread while a thread pool reads and writes them.
+
+    Up to PIPELINE_DEPTH sources are read ahead and up to PIPELINE_DEPTH
+    rendered pages wait to be written; when writes fall behind, rendering
+    and with it further reads wait for the oldest write. Pages are yielded
+    once written and failures raised in page order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    urls = page_urls(basepath)
+    remaining = iter(pages)
+    reads = deque()
+    writes = deque()
+    executor = ThreadPoolExecutor(max_workers=io_threads)
+
+    def prefetch():
+        while len(reads) < PIPELINE_DEPTH:
+            page = next(remaining, None)
+            if page is None:
+                return
+            reads.append((*page, executor.submit(read_page, page[0])))
+
+    def finish_write():
+        src_path, dest_path, future, page, page_template, page_stats = writes.popleft()
+        try:
+            future.result()
+        except Exception as e:
+            raise BuildError(f"Failed to generate page from {src_path}: {e}") from e
+        print(f"Generating page from {src_path} to {dest_path} using {page_template}")
+        warn_degraded(src_path, page_stats)
+        if index is not None:
+            index.add(src_path, dest_path, *page)
+        return src_path, dest_path
+
+    try:
+        prefetch()
+        while reads:
+            src_path, dest_path, future = reads.popleft()
+            prefetch()
+            try:
+                meta, markdown_content = future.result()
+                page_template = page_template_path(meta, template_path)
+                html, title, text = render_to_string(
+                    meta, markdown_content, template_path, urls, index is not None
+                )
+            except Exception as e:
+                while writes:
+                    yield finish_write()
+                raise BuildError(f"Failed to generate page from {src_path}: {e}") from e
+            if len(writes) == PIPELINE_DEPTH:
+                yield finish_write()
+            page_stats = take_render_stats()
+            stats.update(page_stats)
+            future = executor.submit(write_output, dest_path, html)
+            page = (title, text)
+            writes.append(
+                (src_path, dest_path, future, page, page_template, page_stats)
+            )
+        while writes:
+            yield finish_write()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        stats.update(take_cache_stats())
+
+
+def generate_pages(
+    basepath,
+    pages,
+    template_path,
+    jobs=1,
+    profiler=None,
+    stats=None,
+    io_threads=0,
+    index=None,
+):
+    """Generate (source, dest) pages, yielding each one once it is written.
+
+    Pages are yielded and logged in the order given regardless of `jobs`,
+    and the first failure in that order is raised as a BuildError. A
+    profiler can only observe the current process, so it forces a serial
+    build. A serial build with `io_threads` overlaps file I/O with
+    rendering. Block cache counters are added to the `stats` Counter and
+    the title and text of each page to the SiteIndex `index`.
+    """
+    stats = stats if stats is not None else Counter()
+    collect_text = index is not None
+    if io_threads > 0 and jobs <= 1 and profiler is None:
+        yield from generate_pages_pipelined(
+            basepath, pages, template_path, io_threads, stats, index
+        )
+        return
+    if jobs <= 1 or profiler is not None:
+        for src_path, dest_path in pages:
+            try:
+                page_stats, page = generate_page(
+                    basepath, src_path, template_path, dest_path, profiler, collect_text
+                )
+            except Exception as e:
+                raise BuildError(f"Failed to generate page from {src_path}: {e}") from e
+            stats.update(page_stats)
+            warn_degraded(src_path, page_stats)
+            if collect_text:
+                index.add(src_path, dest_path, *page)
+            yield src_path, dest_path
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(_cache_config, _assets, _limits),
+    )
+    try:
+        results = executor.map(
+            render_page,
+            [basepath] * len(pages),
+            [src_path for src_path, _ in pages],
+            [template_path] * len(pages),
+            [dest_path for _, dest_path in pages],
+            [None] * len(pages),
+            [collect_text] * len(pages),
+            chunksize=max(1, len(pages) // (jobs * 4)),
+        )
+        for src_path, dest_path in pages:
+            try:
+                page_stats, page_template, page = next(results)
+            except Exception as e:
+                raise BuildError(f"Failed to generate page from {src_path}: {e}") from e
+            stats.update(page_stats)
+            print(
+                f"Generating page from {src_path} to {dest_path} using {page_template}"
+            )
+            warn_degraded(src_path, page_stats)
+            if collect_text:
+                index.add(src_path, dest_path, *page)
+            yield src_path, dest_path
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir_path):
+    for src_path, dest_path in collect_pages(dir_path_content, dest_dir_path):
+        generate_page(basepath, src_path, template_path, dest_path)
+
+
+def remove_output(path, dest_dir):
+    print(f"Removing stale page {path}")
+    for stale_path in (path, path + ".gz"):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    parent = os.path.dirname(path)
+    while os.path.normpath(parent) != os.path.normpath(dest_dir):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def sync_static(
+    static_dir, dest_dir, manifest, checksum=False, link=False, files=None
+):
+    from sync import sync_tree
+
+    assets, (copied, unchanged, removed) = sync_tree(
+        static_dir, dest_dir, manifest.assets, checksum, link, files=files
+    )
+    manifest.assets = assets
+    print(
+        f"Synced {static_dir}: {copied} copied, {unchanged} up to date, "
+        f"{removed} removed"
+    )
+
+
+def generate_pages_incremental(
+    basepath,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    jobs=1,
+    manifest=None,
+    profiler=None,
+    stats=None,
+    io_threads=0,
+    index=None,
+    shard=None,
+    checksum=False,
+):
+    """Generate the pages whose source, template, URLs, output or
+    render_settings changed.
+
+    A source whose size, mtime and inode match the last build is not read
+    again unless `checksum` is set; its recorded hash and template are used.
+    """
+    from manifest import BuildManifest, file_hash, page_entry, text_hash
+    from scan import scan_tree
+
+    if manifest is None:
+        manifest = BuildManifest.load(BuildManifest.path_for(dest_dir_path))
+    template_hashes = {}
+    urls_key = page_urls(basepath).key
+    render = render_settings()
+    files = scan_tree(dir_path_content, ".md")
+    pages = collect_pages(dir_path_content, dest_dir_path, files)
+    if shard is not None:
+        from shard import select_shard
+
+        pages = select_shard(pages, dir_path_content, shard)
+    manifest.shard = list(shard) if shard is not None else None
+
+    src_paths = {src for src, _ in pages}
+    for stale_output in manifest.remove_stale(src_paths):
+        remove_output(stale_output, dest_dir_path)
+    if index is not None:
+        index.retain(src_paths)
+
+    entries = {}
+    sources = {}
+    for src_path, dest_path in pages:
+        source = files[os.path.relpath(src_path, dir_path_content)]
+        recorded = None if checksum else manifest.recorded_entry(src_path, source)
+        if recorded is not None:
+            source_hash, page_template = recorded["source_hash"], recorded["template"]
+        else:
+            with open(src_path, "r") as f:
+                markdown = f.read()
+            source_hash = text_hash(markdown)
+            meta = split_front_matter(markdown)[0]
+            try:
+                page_template = page_template_path(meta, template_path)
+            except ValueError as e:
+                raise BuildError(
+                    f"Failed to generate page from {src_path}: {e}"
+                ) from e
+        if page_template not in template_hashes:
+            template_hashes[page_template] = file_hash(page_template)
+        entry = page_entry(
+            source_hash,
+            page_template,
+            template_hashes[page_template],
+            urls_key,
+            os.path.relpath(dest_path, dest_dir_path),
+            render,
+        )
+        sources[src_path] = source
+        if not manifest.is_fresh(src_path, entry) or (
+            index is not None and not index.has(src_path)
+        ):
+            entries[src_path] = entry
+        else:
+            manifest.record(src_path, entry, source)
+
+    outdated = [(src, dest) for src, dest in pages if src in entries]
+    try:
+        for src_path, _ in generate_pages(
+            basepath,
+            outdated,
+            template_path,
+            jobs,
+            profiler,
+            stats,
+            io_threads,
+            index,
+        ):
+            manifest.record(src_path, entries[src_path], sources[src_path])
+    finally:
+        # Commit the index rows of the pages the manifest is about to record,
+        # so a failed build cannot leave them fresh but unindexed.
+        if index is not None:
+            index.commit()
+        manifest.save()
+    print(f"{len(outdated)} pages generated, {len(pages) - len(outdated)} up to date")
+
+
+def fingerprint_static(static_dir, dest_dir, link=False, files=None):
+    from assets import fingerprint_assets
+
+    assets, (copied, unchanged, removed, hashed) = fingerprint_assets(
+        static_dir, dest_dir, link, files
+    )
+    print(
+        f"Fingerprinted {len(assets)} assets: {copied} copied, {unchanged} up to "
+        f"date, {removed} removed, {hashed} hashed"
+    )
+    return assets
+
+
+def unfingerprint_static(dest_dir, static_files):
+    from assets import remove_fingerprints
+
+    removed = remove_fingerprints(dest_dir, keep=static_files)
+    if removed:
+        print(f"Removed {removed} fingerprinted assets")
+
+
+def write_site_index(index, dest_dir, basepath, template_path, site_url=""):
+    """Write the search index, the sitemap and the directory listing pages."""
+    from site_index import SEARCH_INDEX, SITEMAP, write_atomic
+
+    write_atomic(os.path.join(dest_dir, SEARCH_INDEX), index.iter_search_index())
+    write_atomic(os.path.join(dest_dir, SITEMAP), index.iter_sitemap(site_url))
+
+    listings = index.listings()
+    for url in index.replace_listings(listings):
+        remove_output(index.listing_output(url), dest_dir)
+    template = load_template(template_path, page_urls(basepath))
+    for url, entries in listings.items():
+        items = [
+            ParentNode("li", [LeafNode("a", title or DEFAULT_TITLE, {"href": href})])
+            for href, title in entries
+        ]
+        html = template.render(
+            {
+                "Title": escape_text(f"Index of {url}"),
+                "Content": ParentNode("ul", items).to_html(),
+            }
+        )
+        write_output(index.listing_output(url), html)
+    print(f"Indexed {len(index.pages())} pages, {len(listings)} directory listings")
+
+
+def remove_site_index(index_path, dest_dir, basepath):
+    """Remove the outputs of write_site_index and the index itself, for a
+    build that no longer writes them."""
+    from cache import remove_database
+    from site_index import SEARCH_INDEX, SITEMAP, SiteIndex
+
+    site_index = SiteIndex(index_path, dest_dir, basepath)
+    try:
+        outputs = [
+            site_index.listing_output(url) for url in site_index.replace_listings([])
+        ]
+    finally:
+        site_index.close()
+    outputs += [os.path.join(dest_dir, SEARCH_INDEX), os.path.join(dest_dir, SITEMAP)]
+    for path in outputs:
+        if os.path.exists(path):
+            remove_output(path, dest_dir)
+    remove_database(index_path)
+
+
+def compress_output(dest_dir, jobs=1, static_files=None):
+    """Precompress the text outputs in `dest_dir`, leaving the static files
+    synced there (by default those in its manifest) as they are."""
+    from compress import compress_tree
+    from manifest import BuildManifest
+
+    if static_files is None:
+        static_files = BuildManifest.load(BuildManifest.path_for(dest_dir)).assets
+    start = time.perf_counter()
+    (compressed, unchanged, removed), (before, after) = compress_tree(
+        dest_dir, jobs if jobs > 1 else None, keep=set(static_files)
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    ratio = f", {after / before:.1%} of {before / 1024:.0f} KiB" if before else ""
+    print(
+        f"Compressed {compressed} files{ratio} in {elapsed:.0f} ms, "
+        f"{unchanged} up to date, {removed} removed"
+    )
+
+
+def prune_compressed(dest_dir, static_files=None):
+    """Remove the stale `.gz` siblings a build without compression leaves;
+    `static_files` is as for compress_output."""
+    from compress import prune_siblings
+    from manifest import BuildManifest
+
+    if static_files is None:
+        static_files = BuildManifest.load(BuildManifest.path_for(dest_dir)).assets
+    removed = prune_siblings(dest_dir, keep=set(static_files))
+    if removed:
+        print(f"Removed {removed} outdated .gz files")
+
+
+def build_site(
+    basepath,
+    content_dir="content",
+    static_dir="static",
+    template_path="template.html",
+    dest_dir=DEST_DIR,
+    incremental=False,
+    jobs=1,
+    checksum=False,
+    link=False,
+    profiler=None,
+    block_cache_size=0,
+    block_cache_db=None,
+    page_cache_db=None,
+    page_cache_bytes=256 << 20,
+    io_threads=0,
+    index=False,
+    site_url="",
+    compress=False,
+    shard=None,
+    fingerprint=False,
+    max_page_chars=0,
+    max_page_seconds=0,
+    strict=False,
+):
+    """Build the site into `dest_dir`.
+
+    With `shard` set to (i, N), only the pages of that shard are rendered and
+    static files are left to the merge; see shard.merge_shards. With
+    `fingerprint`, static files also get content-hashed copies that pages and
+    templates link to instead. The page limits are those of configure_limits.
+    """
+    if shard is not None and (index or fingerprint):
+        raise ValueError("a shard build cannot write the site index or assets")
+    from cache import remove_database
+    from manifest import BuildManifest
+    from scan import scan_tree
+    from site_index import SiteIndex
+
+    manifest_path = BuildManifest.path_for(dest_dir)
+    index_path = SiteIndex.path_for(dest_dir)
+    if not incremental:
+        if os.path.exists(dest_dir):
+            import shutil
+
+            shutil.rmtree(dest_dir)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        remove_database(index_path)
+    elif not index and os.path.exists(index_path):
+        remove_site_index(index_path, dest_dir, basepath)
+    manifest = BuildManifest.load(manifest_path)
+    site_index = SiteIndex(index_path, dest_dir, basepath) if index else None
+
+    static_files = scan_tree(static_dir)
+    if shard is None:
+        sync_static(static_dir, dest_dir, manifest, checksum, link, static_files)
+    if fingerprint:
+        configure_assets(fingerprint_static(static_dir, dest_dir, link, static_files))
+    else:
+        unfingerprint_static(dest_dir, static_files)
+        configure_assets(None)
+
+    configure_caches(
+        block_cache_size, block_cache_db, page_cache_db, page_cache_bytes
+    )
+    configure_limits(max_page_chars, max_page_seconds, strict)
+    stats = Counter()
+    with ExitStack() as stack:
+        if site_index is not None:
+            stack.callback(site_index.close)
+        if profiler is not None:
+            for name in ("classify_block", "render_inline"):
+                stack.enter_context(profiler.instrument(inline_markdown, name))
+        generate_pages_incremental(
+            basepath,
+            content_dir,
+            template_path,
+            dest_dir,
+            jobs,
+            manifest,
+            profiler,
+            stats,
+            io_threads,
+            site_index,
+            shard,
+            checksum,
+        )
+        if site_index is not None:
+            write_site_index(site_index, dest_dir, basepath, template_path, site_url)
+    if compress:
+        compress_output(dest_dir, jobs, static_files)
+    else:
+        prune_compressed(dest_dir, static_files)
+    if stats["oversized_pages"] or stats["slow_pages"] or stats["malformed_blocks"]:
+        print(
+            f"Published as plain text: {stats['oversized_pages']} oversized pages, "
+            f"{stats['slow_pages']} slow pages, {stats['malformed_blocks']} "
+            "malformed blocks"
+        )
+    if stats["untitled_pages"]:
+        print(f"Published as {DEFAULT_TITLE!r}: {stats['untitled_pages']} pages")
+    if block_cache_size > 0:
+        print(
+            f"Block cache: {stats['hits']} hits, {stats['disk_hits']} from disk, "
+            f"{stats['misses']} misses"
+        )
+    if page_cache_db:
+        evicted = _page_cache.evict()
+        print(
+            f"Page cache: {stats['page_hits']} hits, {stats['page_misses']} misses, "
+            f"{evicted} evicted"
+        )
@@ -0,0 +1,197 @@
+import marshal
+import os
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+
+# A hit only refreshes an entry's access time once it is older than this, so
+# rebuilding an unchanged site reads the page cache without writing to it.
+TOUCH_INTERVAL_NS = 3600 * 10**9
+
+
+def open_database(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    # Everything kept in these databases can be rebuilt, so a commit need not
+    # wait for the disk; WAL keeps them consistent across a crash regardless.
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class DiskStore:
+    """A persistent key/value table in an SQLite database.
+
+    Puts are held in memory until `flush` writes them in one statement.
+    """
+
+    def __init__(self, path):
+        self.db = open_database(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value BLOB)"
+        )
+        self.pending = {}
+
+    def get(self, key):
+        value = self.pending.get(key)
+        if value is not None:
+            return value
+        row = self.db.execute(
+            "SELECT value FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, value):
+        self.pending[key] = value
+
+    def flush(self):
+        if self.pending:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)",
+                self.pending.items(),
+            )
+            self.pending.clear()
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+class BlockCache:
+    """A bounded LRU of rendered fragments, optionally backed by a DiskStore."""
+
+    def __init__(self, maxsize=10000, store: DiskStore | None = None):
+        self.maxsize = maxsize
+        self.store = store
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self.remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.remember(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def flush(self):
+        if self.store is not None:
+            self.store.flush()
+
+    def take_stats(self):
+        """Return the hit/miss counters and reset them."""
+        stats = {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+        self.hits = self.disk_hits = self.misses = 0
+        return stats
+
+
+class PageCache:
+    """Rendered page bodies kept across builds in an SQLite database.
+
+    Values are marshalled and zlib-compressed. `evict` drops the least
+    recently used entries until the stored size fits in `max_bytes`. Access
+    times are collected in memory and written by `flush`, so lookups never
+    wait for the write lock other build processes hold.
+    """
+
+    def __init__(self, path, max_bytes=256 << 20):
+        self.max_bytes = max_bytes
+        self.db = open_database(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages "
+            "(key BLOB PRIMARY KEY, value BLOB, size INTEGER, used INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT value, used FROM pages WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        now = time.time_ns()
+        if now - row[1] > TOUCH_INTERVAL_NS:
+            self.used[key] = now
+        return marshal.loads(zlib.decompress(row[0]))
+
+    def put(self, key, value):
+        data = zlib.compress(marshal.dumps(value))
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages (key, value, size, used) VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time_ns()),
+        )
+
+    def size(self):
+        row = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return row[0]
+
+    def evict(self):
+        """Drop least recently used entries over the cap; return how many."""
+        self.flush()
+        excess = self.size() - self.max_bytes
+        evicted = 0
+        rows = self.db.execute("SELECT key, size FROM pages ORDER BY used").fetchall()
+        for key, size in rows:
+            if excess <= 0:
+                break
+            self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            excess -= size
+            evicted += 1
+        self.db.commit()
+        return evicted
+
+    def flush(self):
+        if self.used:
+            self.db.executemany(
+                "UPDATE pages SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self.used.items()],
+            )
+            self.used.clear()
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def take_stats(self):
+        stats = {"page_hits": self.hits, "page_misses": self.misses}
+        self.hits = self.misses = 0
+        return stats
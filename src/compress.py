@@ -0,0 +1,112 @@
+import os
+from scan import scan_tree
+
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+# Below this many files, starting worker processes costs more than it saves.
+MIN_PARALLEL_FILES = 32
+
+
+def compress_file(path, level=9):
+    """Write `path`.gz stamped with the mtime of `path`; return both sizes."""
+    import gzip
+
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = gzip.compress(data, compresslevel=level, mtime=0)
+    tmp_path = path + ".gz.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(tmp_path, path + ".gz")
+    return len(data), len(compressed)
+
+
+def is_compressed(path, stat):
+    try:
+        return os.stat(path + ".gz").st_mtime_ns == stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def remove_sibling(path):
+    """Remove the `.gz` sibling of an output that was just rewritten."""
+    try:
+        os.remove(path + ".gz")
+    except FileNotFoundError:
+        pass
+
+
+def prune_siblings(root, keep=()):
+    """Remove the `.gz` siblings under `root` whose source changed or is gone.
+
+    For builds without compression, which would otherwise leave old pages
+    behind in them; `keep` is as for compress_tree. Returns how many were
+    removed.
+    """
+    files = scan_tree(root)
+    removed = 0
+    for rel_path, (_, mtime_ns, _) in files.items():
+        base = rel_path[:-3]
+        if (
+            rel_path.endswith(".gz")
+            and base.endswith(COMPRESSIBLE_SUFFIXES)
+            and rel_path not in keep
+            and (base not in files or files[base][1] != mtime_ns)
+        ):
+            os.remove(os.path.join(root, rel_path))
+            removed += 1
+    return removed
+
+
+def compress_tree(root, jobs=None, level=9, keep=()):
+    """Give every text file under `root` an up-to-date `.gz` sibling.
+
+    A sibling carries the mtime of its source, so files whose sibling matches
+    are skipped and siblings whose source is gone are removed. `keep` holds
+    paths relative to `root` that were copied there as they are, such as
+    static files: a `.gz` among them is never removed or overwritten. Returns
+    counts (compressed, unchanged, removed) and the bytes before and after
+    compression.
+    """
+    outdated = []
+    unchanged = removed = 0
+    for dir_path, _, file_names in os.walk(root):
+        names = set(file_names)
+        rel_dir = os.path.relpath(dir_path, root)
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if name.endswith(".gz"):
+                base = name[:-3]
+                if (
+                    base.endswith(COMPRESSIBLE_SUFFIXES)
+                    and base not in names
+                    and os.path.normpath(os.path.join(rel_dir, name)) not in keep
+                ):
+                    os.remove(path)
+                    removed += 1
+            elif name.endswith(COMPRESSIBLE_SUFFIXES):
+                if os.path.normpath(os.path.join(rel_dir, name + ".gz")) in keep:
+                    continue
+                if is_compressed(path, os.stat(path)):
+                    unchanged += 1
+                else:
+                    outdated.append(path)
+
+    if len(outdated) < MIN_PARALLEL_FILES or jobs == 1:
+        sizes = [compress_file(path, level) for path in outdated]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            sizes = list(
+                executor.map(
+                    compress_file,
+                    outdated,
+                    [level] * len(outdated),
+                    chunksize=max(1, len(outdated) // ((jobs or os.cpu_count()) * 4)),
+                )
+            )
+    before = sum(size for size, _ in sizes)
+    after = sum(size for _, size in sizes)
+    return (len(outdated), unchanged, removed), (before, after)
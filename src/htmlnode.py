@@ -1,13 +1,25 @@
-from typing import List
 from textnode import TextNode, TextType
 
 
+def escape_text(text: str):
+    """Escape `&`, `<` and `>`, returning `text` itself when it has none."""
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+
+def escape_attr(value: str):
+    return escape_text(value).replace('"', "&quot;")
+
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
         self,
         tag: str | None = None,
         value: str | None = None,
-        children: List["HTMLNode"] | None = None,
+        children: list["HTMLNode"] | None = None,
         props: dict | None = None,
     ):
         self.tag = tag
@@ -16,32 +28,47 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self):
         raise NotImplementedError()
 
+    def write_html(self, fp):
+        for fragment in self.iter_html():
+            fp.write(fragment)
+
     def props_to_html(self):
         if self.props is None:
             return ""
-        return " ".join(f'{k}="{v}"' for k, v in self.props.items())
+        parts = []
+        for k, v in self.props.items():
+            if '"' in v or "&" in v or "<" in v or ">" in v:
+                v = escape_attr(v)
+            parts.append(f'{k}="{v}"')
+        return " ".join(parts)
 
     def __repr__(self):
         return f"HTMLNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
 
 
 class ParentNode(HTMLNode):
-    def __init__(self, tag: str, children: List[HTMLNode], props: dict | None = None):
+    __slots__ = ()
+
+    def __init__(self, tag: str, children: list[HTMLNode], props: dict | None = None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def iter_html(self):
         if not self.tag:
             raise ValueError("Tag is required for ParentNode")
         if not self.children or len(self.children) == 0:
             raise ValueError("Children are required for ParentNode")
-        child = [child.to_html() for child in self.children]
         if not self.props:
-            return f"<{self.tag}>" + "".join(child) + f"</{self.tag}>"
-        return (
-            f"<{self.tag} {self.props_to_html()}>" + "".join(child) + f"</{self.tag}>"
-        )
+            yield f"<{self.tag}>"
+        else:
+            yield f"<{self.tag} {self.props_to_html()}>"
+        for child in self.children:
+            yield from child.iter_html()
+        yield f"</{self.tag}>"
 
     def __repr__(self):
         return (
@@ -50,22 +77,66 @@ class ParentNode(HTMLNode):
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag: str | None, value: str, props: dict | None = None):
         super().__init__(tag, value, None, props)
 
+    def iter_html(self):
+        yield self.to_html()
+
     def to_html(self):
-        if not self.value:
+        value = self.value
+        if not value:
             raise ValueError("LeafNode must have a value")
+        if "&" in value or "<" in value or ">" in value:
+            value = escape_text(value)
         if not self.tag:
-            return self.value
+            return value
         if not self.props:
-            return f"<{self.tag}>{self.value}</{self.tag}>"
-        return f"<{self.tag} {self.props_to_html()}>{self.value}</{self.tag}>"
+            return f"<{self.tag}>{value}</{self.tag}>"
+        return f"<{self.tag} {self.props_to_html()}>{value}</{self.tag}>"
 
     def __repr__(self):
         return f"LeafNode(tag={self.tag}, value={self.value}, props={self.props})"
 
 
+class EscapedLeafNode(LeafNode):
+    """A LeafNode whose value is already escaped text.
+
+    The parser checks a whole inline run once and escapes its leaves up front
+    when needed, so rendering them skips the per-leaf check. Props are still
+    escaped when rendered.
+    """
+
+    __slots__ = ()
+
+    def to_html(self):
+        value = self.value
+        if not value:
+            raise ValueError("LeafNode must have a value")
+        if not self.tag:
+            return value
+        if not self.props:
+            return f"<{self.tag}>{value}</{self.tag}>"
+        return f"<{self.tag} {self.props_to_html()}>{value}</{self.tag}>"
+
+
+class RawNode(HTMLNode):
+    """Markup that is already rendered, such as a cached fragment."""
+
+    __slots__ = ()
+
+    def __init__(self, value: str):
+        super().__init__(None, value, None, None)
+
+    def iter_html(self):
+        yield self.value
+
+    def __repr__(self):
+        return f"RawNode(value={self.value})"
+
+
 def text_node_to_html_node(text_node: TextNode):
     if text_node.text_type == TextType.TEXT:
         return LeafNode(None, text_node.text)
@@ -1,6 +1,20 @@
+import hashlib
 import re
+import time
 from textnode import TextNode, TextType
-from htmlnode import ParentNode, LeafNode
+from htmlnode import EscapedLeafNode, ParentNode, RawNode, escape_attr, escape_text
+
+# Bump whenever the HTML produced for the same Markdown changes, so cached
+# renderings from older versions are not reused.
+PARSER_VERSION = 3
+# Shorter blocks render faster than their cache key is computed and looked up.
+MIN_CACHED_BLOCK = 128
+
+HEADER_RE = re.compile(r"#+ ")
+
+
+class RenderTimeout(Exception):
+    """Rendering a page ran past its deadline."""
 
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -30,159 +44,433 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return new_nodes
 
 
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+
 def extract_markdown_images(text):
-    return re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "[" not in text:
+        return []
+    return IMAGE_RE.findall(text)
 
 
 def extract_markdown_links(text):
-    return re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    if "[" not in text:
+        return []
+    return LINK_RE.findall(text)
 
 
-def split_nodes_image(old_nodes):
+def split_nodes_matching(old_nodes, pattern, text_type):
+    """Split TEXT nodes around the matches of `pattern`, slicing at match offsets."""
     new_nodes = []
     for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
+        text = old_node.text
+        if old_node.text_type != TextType.TEXT or "[" not in text:
             new_nodes.append(old_node)
             continue
-        original_text = old_node.text
-        images = extract_markdown_images(original_text)
-        if len(images) == 0:
+        start = 0
+        for match in pattern.finditer(text):
+            if match.start() > start:
+                new_nodes.append(TextNode(text[start : match.start()], TextType.TEXT))
+            new_nodes.append(TextNode(match[1], text_type, match[2]))
+            start = match.end()
+        if start == 0:
             new_nodes.append(old_node)
-            continue
-        for image in images:
-            sections = original_text.split(f"![{image[0]}]({image[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("Invalid markdown, image section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(
-                TextNode(
-                    image[0],
-                    TextType.IMAGE,
-                    image[1],
-                )
-            )
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
+        elif start < len(text):
+            new_nodes.append(TextNode(text[start:], TextType.TEXT))
     return new_nodes
 
 
+def split_nodes_image(old_nodes):
+    return split_nodes_matching(old_nodes, IMAGE_RE, TextType.IMAGE)
+
+
 def split_nodes_link(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
-        original_text = old_node.text
-        links = extract_markdown_links(original_text)
-        if len(links) == 0:
-            new_nodes.append(old_node)
+    return split_nodes_matching(old_nodes, LINK_RE, TextType.LINK)
+
+
+INLINE_DELIMITERS = (
+    ("**", TextType.BOLD),
+    ("*", TextType.ITALIC),
+    ("_", TextType.ITALIC),
+    ("`", TextType.CODE),
+)
+
+# Images and links in one pattern: a `[` preceded by `!` can only be reached
+# after the image alternative failed at the `!`, which means the link would
+# fail as well, so this matches exactly what the image pass followed by the
+# link pass produce.
+IMAGE_OR_LINK_RE = re.compile(r"(!?)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+
+def span(text, text_type, url=None):
+    return text, text_type, url
+
+
+def lex_inline(text, level=0, make=TextNode):
+    """Yield the TextNodes of `text`, left to right.
+
+    Each of INLINE_DELIMITERS is one str.split level, recursing into the
+    unformatted sections, and the text left after the last level gets one
+    IMAGE_OR_LINK_RE scan: five passes over the text in all, each in C and
+    none allocating intermediate nodes. Produces the same stream as chaining
+    split_nodes_delimiter for each delimiter followed by split_nodes_image
+    and split_nodes_link. Passing `make=span` yields (text, text_type, url)
+    tuples instead of nodes.
+    """
+    if level == len(INLINE_DELIMITERS):
+        yield from lex_images_and_links(text, make)
+        return
+    delimiter, text_type = INLINE_DELIMITERS[level]
+    sections = text.split(delimiter)
+    if len(sections) % 2 == 0:
+        if delimiter != "_":
+            raise ValueError("Invalid markdown, formatted section not closed")
+        yield from lex_inline(text, level + 1, make)
+        return
+    for i, section in enumerate(sections):
+        if section == "":
             continue
-        for link in links:
-            sections = original_text.split(f"[{link[0]}]({link[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("Invalid markdown, link section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
-    return new_nodes
+        if i % 2 == 0:
+            yield from lex_inline(section, level + 1, make)
+        else:
+            yield make(section, text_type)
+
+
+def lex_images_and_links(text, make=TextNode):
+    if "[" not in text:
+        if text:
+            yield make(text, TextType.TEXT)
+        return
+    start = 0
+    for match in IMAGE_OR_LINK_RE.finditer(text):
+        if match.start() > start:
+            yield make(text[start : match.start()], TextType.TEXT)
+        bang, alt, url = match.groups()
+        yield make(alt, TextType.IMAGE if bang else TextType.LINK, url)
+        start = match.end()
+    if start < len(text):
+        yield make(text[start:], TextType.TEXT)
 
 
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    return nodes
+    return list(lex_inline(text))
 
 
-def markdown_to_blocks(text):
-    return list(
-        map(
-            lambda x: x.strip(),
-            filter(lambda x: len(x) > 0, text.split("\n\n")),
-        )
-    )
+def iter_lines(text):
+    """Yield the lines of `text` without building a list of them."""
+    start = 0
+    end = text.find("\n")
+    while end != -1:
+        yield text[start:end]
+        start = end + 1
+        end = text.find("\n", start)
+    yield text[start:]
 
 
-def block_to_block_type(block):
-    if re.match(r"#+ ", block):
+def iter_blocks(lines, fences=True):
+    """Yield (block, block_type) pairs from an iterable of lines.
+
+    Blocks are separated by empty lines and yielded as soon as they end, so
+    `lines` can be a file object. A block opening with a ``` fence runs until
+    a line ending with ```, keeping any blank lines inside the fence; a fence
+    that is never closed falls back to splitting at blank lines.
+    """
+    block_lines = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if in_fence:
+            block_lines.append(line)
+            in_fence = not line.rstrip().endswith("```")
+            continue
+        if line == "":
+            if block_lines:
+                yield finish_block(block_lines)
+                block_lines = []
+            continue
+        if not block_lines:
+            line = line.lstrip()
+            if line == "":
+                continue
+            if fences and line.startswith("```"):
+                in_fence = len(line) < 6 or not line.rstrip().endswith("```")
+        block_lines.append(line)
+    if in_fence:
+        yield from iter_blocks(block_lines, fences=False)
+    elif block_lines:
+        yield finish_block(block_lines)
+
+
+def finish_block(block_lines):
+    while not block_lines[-1].strip():
+        block_lines.pop()
+    block_lines[-1] = block_lines[-1].rstrip()
+    return "\n".join(block_lines), classify_block(block_lines)
+
+
+def classify_block(lines):
+    """Classify a block from its lines, testing every line prefix in one scan."""
+    first = lines[0]
+    if HEADER_RE.match(first):
         return "header"
-    if block.startswith("```") and block.endswith("```"):
+    if first.startswith("```") and lines[-1].endswith("```"):
         return "code"
-    if all(line.startswith(">") for line in block.split("\n")):
+    quote = unordered = ordered = True
+    for i, line in enumerate(lines):
+        quote = quote and line.startswith(">")
+        unordered = unordered and line.startswith(("* ", "- "))
+        ordered = ordered and line.startswith(f"{i + 1}. ")
+        if not (quote or unordered or ordered):
+            return "paragraph"
+    if quote:
         return "quote"
-    if all(line.startswith(("* ", "- ")) for line in block.split("\n")):
+    if unordered:
         return "unordered_list"
-    if all(line.startswith(f"{i + 1}. ") for i, line in enumerate(block.split("\n"))):
-        return "ordered_list"
-    return "paragraph"
+    return "ordered_list"
+
+
+def markdown_to_blocks(text):
+    return [block for block, _ in iter_blocks(iter_lines(text))]
 
 
-def text_to_children(text):
+def block_to_block_type(block):
+    return classify_block(block.split("\n"))
+
+
+INLINE_TAGS = {
+    TextType.TEXT: None,
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+    TextType.LINK: "a",
+    TextType.IMAGE: "img",
+}
+
+
+def text_to_children(text, urls=None, plain=None):
+    """Convert inline Markdown to escaped LeafNodes, appending its plaintext
+    to `plain`. The text is checked for characters to escape once as a whole."""
     nodes = text_to_textnodes(text)
+    if plain is not None:
+        plain.append("".join(node.text for node in nodes))
+    unsafe = "&" in text or "<" in text or ">" in text
     children = []
     for node in nodes:
-        if node.text_type == TextType.TEXT:
-            children.append(LeafNode(None, node.text))
-        elif node.text_type == TextType.BOLD:
-            children.append(LeafNode("b", node.text))
-        elif node.text_type == TextType.ITALIC:
-            children.append(LeafNode("i", node.text))
-        elif node.text_type == TextType.CODE:
-            children.append(LeafNode("code", node.text))
-        elif node.text_type == TextType.LINK:
-            children.append(LeafNode("a", node.text, {"href": node.url}))
+        value = escape_text(node.text) if unsafe else node.text
+        props = None
+        if node.text_type == TextType.LINK:
+            props = {"href": urls(node.url) if urls else node.url}
         elif node.text_type == TextType.IMAGE:
-            children.append(
-                LeafNode("img", node.text, {"src": node.url, "alt": node.text})
-            )
+            props = {"src": urls(node.url) if urls else node.url, "alt": node.text}
+        children.append(EscapedLeafNode(INLINE_TAGS[node.text_type], value, props))
     return children
 
 
-def markdown_to_html(markdown):
-    blocks = markdown_to_blocks(markdown)
+def attr(value):
+    if '"' in value or "&" in value or "<" in value or ">" in value:
+        return escape_attr(value)
+    return value
+
+
+def render_inline(text, urls=None, plain=None):
+    """Render inline Markdown straight to HTML, as text_to_children followed by
+    to_html would, without building nodes. Raises ValueError where they would."""
+    spans = list(lex_inline(text, make=span))
+    if not spans:
+        raise ValueError("Children are required for ParentNode")
+    if plain is not None:
+        plain.append("".join(span[0] for span in spans))
+    unsafe = "&" in text or "<" in text or ">" in text
+    parts = []
+    for text, text_type, url in spans:
+        if not text:
+            raise ValueError("LeafNode must have a value")
+        value = escape_text(text) if unsafe else text
+        if text_type == TextType.TEXT:
+            parts.append(value)
+        elif text_type == TextType.LINK:
+            url = attr(urls(url) if urls else url)
+            parts.append(f'<a href="{url}">{value}</a>')
+        elif text_type == TextType.IMAGE:
+            src = attr(urls(url) if urls else url)
+            parts.append(f'<img src="{src}" alt="{attr(text)}">{value}</img>')
+        else:
+            tag = INLINE_TAGS[text_type]
+            parts.append(f"<{tag}>{value}</{tag}>")
+    return "".join(parts)
+
+
+def block_to_html_node(block, block_type, urls=None, plain=None):
+    if block_type == "paragraph":
+        return ParentNode("p", text_to_children(block, urls, plain))
+
+    elif block_type == "header":
+        level = len(block.split(" ")[0])  # Count #'s
+        header_text = block[level + 1 :]  # Skip #'s and space
+        return ParentNode(f"h{level}", text_to_children(header_text, urls, plain))
+
+    elif block_type == "code":
+        code_text = block.strip("```").strip()
+        code_node = ParentNode("code", text_to_children(code_text, urls, plain))
+        return ParentNode("pre", [code_node])
+
+    elif block_type == "quote":
+        quote_text = "\n".join(line[2:] for line in block.split("\n"))
+        return ParentNode("blockquote", text_to_children(quote_text, urls, plain))
+
+    elif block_type == "unordered_list":
+        items = []
+        for line in block.split("\n"):
+            item_text = line[2:]  # Remove "* " or "- "
+            items.append(ParentNode("li", text_to_children(item_text, urls, plain)))
+        return ParentNode("ul", items)
+
+    elif block_type == "ordered_list":
+        items = []
+        for line in block.split("\n"):
+            item_text = line[line.find(" ") + 1 :]  # Remove "1. ", "2. ", etc
+            items.append(ParentNode("li", text_to_children(item_text, urls, plain)))
+        return ParentNode("ol", items)
+
+
+def block_to_html(block, block_type, urls=None, plain=None):
+    """Render a block straight to the HTML block_to_html_node would produce."""
+    if block_type == "paragraph":
+        return f"<p>{render_inline(block, urls, plain)}</p>"
+
+    elif block_type == "header":
+        level = len(block.split(" ")[0])
+        inner = render_inline(block[level + 1 :], urls, plain)
+        return f"<h{level}>{inner}</h{level}>"
+
+    elif block_type == "code":
+        inner = render_inline(block.strip("```").strip(), urls, plain)
+        return f"<pre><code>{inner}</code></pre>"
+
+    elif block_type == "quote":
+        quote_text = "\n".join(line[2:] for line in block.split("\n"))
+        return f"<blockquote>{render_inline(quote_text, urls, plain)}</blockquote>"
+
+    elif block_type == "unordered_list":
+        items = [
+            f"<li>{render_inline(line[2:], urls, plain)}</li>"
+            for line in block.split("\n")
+        ]
+        return f"<ul>{''.join(items)}</ul>"
+
+    elif block_type == "ordered_list":
+        items = [
+            f"<li>{render_inline(line[line.find(' ') + 1 :], urls, plain)}</li>"
+            for line in block.split("\n")
+        ]
+        return f"<ol>{''.join(items)}</ol>"
+
+
+def plain_block_html(block):
+    return f"<p>{escape_text(block)}</p>"
+
+
+def render_block(block, block_type, urls=None, plain=None, errors=None):
+    """block_to_html, or with an `errors` list, the block as escaped plain
+    text when it cannot be parsed, appending the ValueError to `errors`."""
+    if errors is None:
+        return block_to_html(block, block_type, urls, plain)
+    mark = len(plain) if plain is not None else 0
+    try:
+        return block_to_html(block, block_type, urls, plain)
+    except ValueError as e:
+        errors.append(e)
+        if plain is not None:
+            del plain[mark:]
+            plain.append(block)
+        return plain_block_html(block)
+
+
+def block_cache_key(block, urls=None):
+    key = f"{PARSER_VERSION}\0{urls.key if urls else '/'}\0{block}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+def markdown_to_html(markdown, urls=None, cache=None, plain=None):
+    """Parse `markdown`, a string or an iterable of lines, into a div ParentNode.
+
+    `urls` is an optional UrlResolver applied to generated link and image URLs.
+    With a BlockCache, each block is rendered once per distinct content and
+    reused as a RawNode. The plaintext of every paragraph, heading and list
+    item is appended to the `plain` list when one is given.
+    """
+    lines = iter_lines(markdown) if isinstance(markdown, str) else markdown
     children = []
 
-    for block in blocks:
-        block_type = block_to_block_type(block)
-
-        if block_type == "paragraph":
-            children.append(ParentNode("p", text_to_children(block)))
-
-        elif block_type == "header":
-            level = len(block.split(" ")[0])  # Count #'s
-            header_text = block[level + 1 :]  # Skip #'s and space
-            children.append(ParentNode(f"h{level}", text_to_children(header_text)))
-
-        elif block_type == "code":
-            code_text = block.strip("```").strip()
-            code_node = ParentNode("code", text_to_children(code_text))
-            children.append(ParentNode("pre", [code_node]))
-
-        elif block_type == "quote":
-            quote_text = "\n".join(line[2:] for line in block.split("\n"))
-            children.append(ParentNode("blockquote", text_to_children(quote_text)))
-
-        elif block_type == "unordered_list":
-            items = []
-            for line in block.split("\n"):
-                item_text = line[2:]  # Remove "* " or "- "
-                items.append(ParentNode("li", text_to_children(item_text)))
-            children.append(ParentNode("ul", items))
-
-        elif block_type == "ordered_list":
-            items = []
-            for line in block.split("\n"):
-                item_text = line[line.find(" ") + 1 :]  # Remove "1. ", "2. ", etc
-                items.append(ParentNode("li", text_to_children(item_text)))
-            children.append(ParentNode("ol", items))
-
-    return ParentNode("div", children)
\ No newline at end of file
+    for block, block_type in iter_blocks(lines):
+        if cache is None or len(block) < MIN_CACHED_BLOCK:
+            children.append(block_to_html_node(block, block_type, urls, plain))
+            continue
+        key = block_cache_key(block, urls)
+        fragment = cache.get(key)
+        if fragment is None:
+            node = block_to_html_node(block, block_type, urls, plain)
+            fragment = node.to_html()
+            cache.put(key, fragment)
+        elif plain is not None:
+            # Cached blocks still need their text; parse but skip rendering.
+            block_to_html_node(block, block_type, urls, plain)
+        children.append(RawNode(fragment))
+
+    return ParentNode("div", children)
+
+
+def markdown_to_html_string(
+    markdown, urls=None, cache=None, plain=None, errors=None, deadline=None
+):
+    """Render `markdown` to the same string as markdown_to_html(...).to_html().
+
+    Blocks are rendered straight from the scanner without building TextNodes or
+    an HTML tree, which is what page builds use; markdown_to_html remains for
+    callers that want the tree. Other arguments are as for markdown_to_html.
+
+    With an `errors` list, malformed blocks degrade to escaped plain text
+    instead of raising (see render_block) and are not cached. RenderTimeout
+    is raised once a block ends after the time.perf_counter() `deadline`.
+    """
+    return "".join(iter_markdown_html(markdown, urls, cache, plain, errors, deadline))
+
+
+def iter_markdown_html(
+    markdown, urls=None, cache=None, plain=None, errors=None, deadline=None
+):
+    """Yield the HTML of markdown_to_html_string one block at a time.
+
+    Blocks are parsed as the fragments are consumed, so a page can be written
+    out without holding its whole body; `plain` and `errors` are complete and
+    exceptions raised only once the iterator is.
+    """
+    lines = iter_lines(markdown) if isinstance(markdown, str) else markdown
+    yield "<div>"
+    empty = True
+
+    for block, block_type in iter_blocks(lines):
+        empty = False
+        if cache is None or len(block) < MIN_CACHED_BLOCK:
+            yield render_block(block, block_type, urls, plain, errors)
+        else:
+            key = block_cache_key(block, urls)
+            fragment = cache.get(key)
+            if fragment is None:
+                failed = len(errors) if errors is not None else 0
+                fragment = render_block(block, block_type, urls, plain, errors)
+                if errors is None or len(errors) == failed:
+                    cache.put(key, fragment)
+            elif plain is not None:
+                render_block(block, block_type, urls, plain, errors)
+            yield fragment
+        if deadline is not None and time.perf_counter() > deadline:
+            raise RenderTimeout()
+
+    if empty:
+        error = ValueError("Children are required for ParentNode")
+        if errors is None:
+            raise error
+        errors.append(error)
+    yield "</div>"
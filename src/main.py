@@ -1,79 +1,341 @@
-import sys
-from inline_markdown import markdown_to_html
-import os
-import shutil
+"""Command line entry point.
+
+    main.py [build] [basepath] [options]    build the site into docs/
+    main.py page FILE [--basepath PATH]     render one Markdown file to stdout
+    main.py serve [basepath] [--port N]     serve docs/, rendering unbuilt pages
+    main.py build --shard i/N [basepath]    build one slice into shards/i-of-N/
+    main.py merge SHARD_DIR...              combine shard builds into docs/
 
-DEST_DIR = "docs"
+Default inputs and outputs live in the repository root whatever the working
+directory, and each command imports only the modules it needs.
+"""
 
+import argparse
+import os
+import sys
 
-def copy_content(src="static", dst=DEST_DIR):
-    if not os.path.exists(dst):
-        os.makedirs(dst)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = ("build", "page", "serve", "merge")
 
-    for item in os.listdir(src):
-        src_path = os.path.join(src, item)
-        dst_path = os.path.join(dst, item)
 
-        if os.path.isfile(src_path):
-            shutil.copy2(src_path, dst_path)
-        elif os.path.isdir(src_path):
-            copy_content(src_path, dst_path)
+def parse_args(argv):
+    if not argv or argv[0] not in (*COMMANDS, "-h", "--help"):
+        argv = ["build", *argv]
+    cli = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = cli.add_subparsers(dest="command", required=True)
 
+    page = commands.add_parser("page", help="render one Markdown file to stdout")
+    page.add_argument("file")
+    page.add_argument("--basepath", default="/")
+    page.add_argument(
+        "--template",
+        help="template to render with (default: template.html in the repository)",
+    )
 
-def extract_title(markdown):
-    lines = markdown.split("\n")
-    for line in lines:
-        if line.startswith("# "):
-            return line.lstrip("# ").strip()
-    raise ValueError("No h1 header found in markdown file")
+    serve = commands.add_parser("serve", help="serve the site on localhost")
+    serve.add_argument("basepath", nargs="?", default="/")
+    serve.add_argument("--port", type=int, default=8888)
 
+    merge = commands.add_parser("merge", help="combine shard builds into docs/")
+    merge.add_argument("shard_dirs", nargs="+", metavar="SHARD_DIR")
+    merge.add_argument("--checksum", action="store_true")
+    merge.add_argument("--link", action="store_true")
+    merge.add_argument("--compress", action="store_true")
 
-def generate_page(basepath, from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    parser = commands.add_parser("build", help="build the site (the default)")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep the existing output and regenerate only changed pages",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes used to render pages (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--io-threads",
+        type=int,
+        default=0,
+        metavar="N",
+        help="overlap reading and writing pages with rendering using N threads "
+        "(serial builds only)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_arg,
+        metavar="i/N",
+        help="render only the i-th of N slices of the pages, into shards/i-of-N/",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static files and page sources by content hash instead of "
+        "size and mtime",
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="reflink or hard link static files instead of copying when possible",
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="also write a search index, a sitemap and directory listing pages",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        metavar="URL",
+        help="scheme and host prefixed to the URLs in sitemap.xml",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="also copy static files to content-hashed names and link pages to those",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write a .gz sibling next to every HTML, CSS, JS, JSON, XML and SVG "
+        "output",
+    )
+    parser.add_argument(
+        "--max-page-size",
+        type=int,
+        default=4096,
+        metavar="KIB",
+        help="publish pages with more than this many Ki characters of Markdown as "
+        "plain text (0: no limit)",
+    )
+    parser.add_argument(
+        "--max-page-time",
+        type=float,
+        default=10,
+        metavar="SECONDS",
+        help="publish pages still rendering after this long as plain text; checked "
+        "between blocks, so one huge block is not interrupted (0: no limit)",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="fail on malformed Markdown or a missing # heading instead of "
+        "publishing the page anyway",
+    )
+    parser.add_argument(
+        "--block-cache-db",
+        metavar="PATH",
+        help="reuse blocks rendered by earlier builds from an SQLite database",
+    )
+    parser.add_argument(
+        "--page-cache",
+        action="store_true",
+        help="reuse rendered page bodies across builds from .cache/pages.sqlite",
+    )
+    parser.add_argument(
+        "--page-cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="evict least recently used page cache entries beyond this size",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="delete the page cache and block cache databases before building",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each build stage per page; implies --jobs 1",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages reported by --profile",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        default="build-trace.json",
+        metavar="PATH",
+        help="where --profile writes its Chrome trace",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="after building, rebuild affected outputs whenever inputs change",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="after building, serve the site from memory on localhost",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port used by --serve",
+    )
+    args = cli.parse_args(argv)
+    if args.command == "build" and args.shard:
+        if args.index or args.fingerprint or args.serve or args.watch:
+            parser.error(
+                "--shard cannot be combined with --index, --fingerprint, --serve "
+                "or --watch"
+            )
+    if args.command == "build" and args.watch:
+        # The watcher rewrites pages and static files without updating any of
+        # these outputs.
+        for name in ("fingerprint", "index", "compress"):
+            if getattr(args, name):
+                parser.error(f"--{name} cannot be combined with --watch")
+    return args
 
-    with open(from_path, "r") as f:
-        markdown_content = f.read()
 
-    with open(template_path, "r") as f:
-        template_content = f.read()
+def shard_arg(value):
+    from shard import parse_shard
 
-    html_node = markdown_to_html(markdown_content)
-    html_content = html_node.to_html()
-    title = extract_title(markdown_content)
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-    final_html = (template_content
-                  .replace("{{ Title }}", title)
-                  .replace("{{ Content }}", html_content)
-                  .replace('href="/', f'href="{basepath}')
-                  .replace('src="/', f'src="{basepath}'))
 
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, "w") as f:
-        f.write(final_html)
+def render_page(args):
+    from build import read_page, render_to_string
+    from urls import UrlResolver
 
+    try:
+        meta, markdown = read_page(args.file)
+        html, _, _ = render_to_string(
+            meta, markdown, args.template, UrlResolver(args.basepath)
+        )
+    except Exception as e:
+        sys.exit(f"error: {args.file}: {e}")
+    sys.stdout.write(html)
 
-def generate_pages_recursive(basepath, dir_path_content, template_path, dest_dir_path):
-    for item in os.listdir(dir_path_content):
-        src_path = os.path.join(dir_path_content, item)
 
-        if os.path.isfile(src_path) and src_path.endswith(".md"):
-            dest_path = os.path.join(dest_dir_path, os.path.splitext(item)[0] + ".html")
-            generate_page(basepath, src_path, template_path, dest_path)
-        elif os.path.isdir(src_path):
-            new_dest_dir = os.path.join(dest_dir_path, item)
-            new_src_dir = os.path.join(dir_path_content, item)
-            generate_pages_recursive(basepath, new_src_dir, template_path, new_dest_dir)
+def serve_site(args):
+    from server import SiteCache, serve
+
+    try:
+        serve(SiteCache(basepath=args.basepath), port=args.port)
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
+    args = parse_args(sys.argv[1:])
+    # Paths given on the command line are relative to the working directory,
+    # everything else to the repository root.
+    for name in ("file", "template", "block_cache_db", "profile_trace"):
+        if getattr(args, name, None):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    if args.command == "merge":
+        args.shard_dirs = [os.path.abspath(path) for path in args.shard_dirs]
+    os.chdir(ROOT)
+    if args.command == "page":
+        args.template = args.template or "template.html"
+        return render_page(args)
+    if args.command == "serve":
+        return serve_site(args)
+    if args.command == "merge":
+        return merge(args)
+    build(args)
+
+
+def merge(args):
+    from build import BuildError, compress_output, prune_compressed
+    from shard import merge_shards
+
+    try:
+        merge_shards(args.shard_dirs, checksum=args.checksum, link=args.link)
+    except BuildError as e:
+        sys.exit(f"error: {e}")
+    if args.compress:
+        compress_output("docs", os.cpu_count())
+    else:
+        prune_compressed("docs")
+
+
+def build(args):
+    from build import PAGE_CACHE_DB, BuildError, build_site
+
+    profiler = None
+    if args.profile:
+        from profiling import Profiler
+
+        profiler = Profiler()
+
+    if args.clear_cache:
+        from cache import remove_database
+
+        remove_database(PAGE_CACHE_DB)
+        if args.block_cache_db:
+            remove_database(args.block_cache_db)
+
+    kwargs = {}
+    if args.shard:
+        from shard import shard_dir
+
+        kwargs = {"dest_dir": shard_dir(args.shard), "shard": args.shard}
+    try:
+        build_site(
+            args.basepath,
+            incremental=args.incremental,
+            jobs=args.jobs or os.cpu_count(),
+            checksum=args.checksum,
+            link=args.link,
+            profiler=profiler,
+            block_cache_size=10000 if args.block_cache_db else 0,
+            block_cache_db=args.block_cache_db,
+            page_cache_db=PAGE_CACHE_DB if args.page_cache else None,
+            page_cache_bytes=args.page_cache_size << 20,
+            io_threads=args.io_threads,
+            index=args.index,
+            site_url=args.site_url,
+            compress=args.compress,
+            fingerprint=args.fingerprint,
+            max_page_chars=args.max_page_size << 10,
+            max_page_seconds=args.max_page_time,
+            strict=args.strict,
+            **kwargs,
+        )
+    except BuildError as e:
+        if not (args.watch or args.serve):
+            sys.exit(f"error: {e}")
+        print(f"error: {e}")
+
+    if profiler is not None:
+        print(profiler.report(args.profile_top))
+        profiler.write_trace(args.profile_trace)
+        print(f"Wrote trace to {args.profile_trace}")
 
-    if os.path.exists(DEST_DIR):
-        shutil.rmtree(DEST_DIR)
+    try:
+        if args.serve:
+            import threading
+            from server import SiteCache, serve
 
-    copy_content("static", DEST_DIR)
+            cache = SiteCache(
+                basepath=args.basepath,
+                limits=(args.max_page_size << 10, args.max_page_time, args.strict),
+            )
+            if not args.watch:
+                serve(cache, port=args.port)
+            threading.Thread(
+                target=serve, args=(cache,), kwargs={"port": args.port}, daemon=True
+            ).start()
+        if args.watch:
+            from watch import Watcher
 
-    generate_pages_recursive(basepath, "content", "template.html", DEST_DIR)
+            Watcher(args.basepath).run()
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
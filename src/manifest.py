@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 7
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    """Records the inputs each output was generated from.
+
+    Stored as JSON next to the destination directory, e.g. `docs` is
+    tracked by `.docs-manifest.json`. Page outputs are recorded relative to
+    that directory, so a manifest stays valid when the directory and the
+    manifest are moved together. `sources` holds the [size, mtime_ns,
+    inode] each page's source had when its entry was recorded, and a shard
+    build records its (i, N).
+    """
+
+    def __init__(
+        self,
+        path,
+        pages: dict | None = None,
+        assets: dict | None = None,
+        shard: list | None = None,
+        sources: dict | None = None,
+    ):
+        self.path = path
+        self.dest_dir = BuildManifest.dest_dir_for(path)
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else {}
+        self.shard = shard
+        self.sources = sources if sources is not None else {}
+
+    @staticmethod
+    def path_for(dest_dir):
+        dest_dir = os.path.normpath(dest_dir)
+        parent, name = os.path.split(dest_dir)
+        return os.path.join(parent, f".{name}-manifest.json")
+
+    @staticmethod
+    def dest_dir_for(path):
+        """The inverse of path_for; any other name tracks its own directory."""
+        parent, name = os.path.split(path)
+        if name.startswith(".") and name.endswith("-manifest.json"):
+            return os.path.join(parent, name[1 : -len("-manifest.json")])
+        return parent
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(
+            path,
+            data.get("pages", {}),
+            data.get("assets", {}),
+            data.get("shard"),
+            data.get("sources", {}),
+        )
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "pages": self.pages,
+                    "assets": self.assets,
+                    "shard": self.shard,
+                    "sources": self.sources,
+                },
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, src_path, entry):
+        old = self.pages.get(src_path)
+        return old == entry and os.path.exists(self.output_path(entry))
+
+    def output_path(self, entry):
+        return os.path.join(self.dest_dir, entry["output"])
+
+    def record(self, src_path, entry, source=None):
+        self.pages[src_path] = entry
+        if source is not None:
+            self.sources[src_path] = source
+        else:
+            self.sources.pop(src_path, None)
+
+    def recorded_entry(self, src_path, source):
+        """Return the entry recorded while the source had the same size, mtime
+        and inode as `source`, if any."""
+        if self.sources.get(src_path) == source:
+            return self.pages.get(src_path)
+        return None
+
+    def remove_stale(self, src_paths):
+        """Forget pages whose source is gone and return their output paths."""
+        removed = []
+        for src_path in list(self.pages):
+            if src_path not in src_paths:
+                removed.append(self.output_path(self.pages.pop(src_path)))
+                self.sources.pop(src_path, None)
+        return removed
+
+
+def page_entry(source_hash, template, template_hash, urls_key, output, render=None):
+    """The inputs of one page; `render` holds the parser version and page
+    limits it was rendered with, so changing either regenerates it."""
+    return {
+        "source_hash": source_hash,
+        "template": template,
+        "template_hash": template_hash,
+        "urls": urls_key,
+        "output": output,
+        "render": render,
+    }
@@ -0,0 +1,120 @@
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class NullProfiler:
+    enabled = False
+
+    def page(self, path):
+        return nullcontext()
+
+    def stage(self, name, trace=True):
+        return nullcontext()
+
+
+class Profiler:
+    """Records wall time and net allocated blocks per page and per stage.
+
+    Stage times are kept exclusive of nested stages, so the per-stage summary
+    adds up to the page totals. Events are kept in Chrome trace format.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.pages = {}
+        self.stages = {}
+        self.events = []
+        self.current_page = None
+        self.stack = []
+
+    @contextmanager
+    def page(self, path):
+        self.current_page = path
+        self.pages[path] = 0
+        start = time.perf_counter_ns()
+        blocks = sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self.pages[path] = elapsed
+            self.add_event(path, "page", start, elapsed, blocks)
+            self.current_page = None
+
+    @contextmanager
+    def stage(self, name, trace=True):
+        start = time.perf_counter_ns()
+        blocks = sys.getallocatedblocks()
+        self.stack.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            stats = self.stages.setdefault(name, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += elapsed - nested
+            stats[2] += sys.getallocatedblocks() - blocks
+            if trace:
+                self.add_event(name, "stage", start, elapsed, blocks)
+
+    def add_event(self, name, category, start, elapsed, blocks):
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": elapsed / 1000,
+                "pid": 1,
+                "tid": 1,
+                "args": {
+                    "page": self.current_page,
+                    "allocated_blocks": sys.getallocatedblocks() - blocks,
+                },
+            }
+        )
+
+    @contextmanager
+    def instrument(self, module, name, trace=False):
+        """Time every call of `module.name` as a stage of the same name."""
+        original = getattr(module, name)
+
+        def wrapper(*args, **kwargs):
+            with self.stage(name, trace):
+                return original(*args, **kwargs)
+
+        setattr(module, name, wrapper)
+        try:
+            yield
+        finally:
+            setattr(module, name, original)
+
+    def report(self, top=10):
+        lines = [f"Slowest {min(top, len(self.pages))} pages:"]
+        slowest = sorted(self.pages.items(), key=lambda item: item[1], reverse=True)
+        for path, elapsed in slowest[:top]:
+            lines.append(f"  {elapsed / 1e6:10.2f} ms  {path}")
+        lines.append("Stages (exclusive time):")
+        lines.append(
+            f"  {'stage':<20} {'calls':>8} {'total ms':>10} {'mean ms':>10} "
+            f"{'net blocks':>12}"
+        )
+        stages = sorted(self.stages.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, elapsed, blocks) in stages:
+            lines.append(
+                f"  {name:<20} {calls:>8} {elapsed / 1e6:>10.2f} "
+                f"{elapsed / calls / 1e6:>10.4f} {blocks:>12}"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        import json
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,36 @@
+import os
+
+
+def scan_tree(root, suffix=""):
+    """Return {rel_path: [size, mtime_ns, inode]} for the files under `root`.
+
+    Walks iteratively with os.scandir, so deep trees cannot exhaust the
+    recursion limit and whether an entry is a file or a directory comes from
+    the listing itself; only files ending with `suffix` are stat'ed. A
+    missing root is an empty tree.
+    """
+    files = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, rel_dir) if rel_dir else root)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir():
+                    pending.append(rel_path)
+                elif entry.name.endswith(suffix) and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files[rel_path] = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    return files
+
+
+def tree_order(rel_path):
+    """Sort key listing a directory's entries by name, depth first."""
+    return rel_path.split(os.sep)
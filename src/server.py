@@ -0,0 +1,256 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import threading
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from assets import read_asset_manifest
+from build import page_template_path, read_page, render_to_string
+from urls import UrlResolver
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json")
+MIN_GZIP_SIZE = 256
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Entry:
+    """A response body kept in memory with the file stats it was built from."""
+
+    __slots__ = ("body", "gzip_body", "etag", "content_type", "deps")
+
+    def __init__(self, body, content_type, deps, gzip_body=None):
+        self.body = body
+        self.content_type = content_type
+        self.deps = deps
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        if gzip_body is None and len(body) >= MIN_GZIP_SIZE and is_compressible(
+            content_type
+        ):
+            gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+            if len(gzip_body) >= len(body):
+                gzip_body = None
+        self.gzip_body = gzip_body
+
+    @property
+    def gzip_etag(self):
+        return self.etag[:-1] + '-gz"'
+
+    def is_fresh(self):
+        return all(file_stamp(path) == stamp for path, stamp in self.deps)
+
+
+def is_compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def guess_type(path):
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+class SiteCache:
+    """Serves the built site from memory, rendering unbuilt pages on demand.
+
+    Entries are revalidated against the mtime and size of the files they were
+    made from, so rebuilt outputs and edited sources are picked up. A `.gz`
+    sibling of a built file is used as its gzip variant when it is up to date.
+    Pages rendered on demand link to the fingerprinted assets of the last
+    build, which are served as immutable, and are bounded by `limits` (as for
+    build.configure_limits).
+    """
+
+    def __init__(
+        self,
+        dest_dir="docs",
+        content_dir="content",
+        template_path="template.html",
+        basepath="/",
+        limits=(0, 0, False),
+    ):
+        self.dest_dir = dest_dir
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.limits = limits
+        self.urls = UrlResolver(basepath, read_asset_manifest(dest_dir))
+        self.immutable = {path[1:] for path in self.urls.assets.values()}
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, rel_path):
+        """Return the Entry for a site-relative path, or None if there is none."""
+        entry = self.entries.get(rel_path)
+        if entry is not None and entry.is_fresh():
+            return entry
+        entry = self.load(rel_path)
+        with self.lock:
+            if entry is None:
+                self.entries.pop(rel_path, None)
+            else:
+                self.entries[rel_path] = entry
+        return entry
+
+    def load(self, rel_path):
+        path = os.path.join(self.dest_dir, *rel_path.split("/"))
+        stamp = file_stamp(path)
+        if stamp is not None and os.path.isfile(path):
+            return self.load_file(path, stamp)
+        if rel_path.endswith(".html"):
+            return self.render(rel_path)
+        return None
+
+    def load_file(self, path, stamp):
+        with open(path, "rb") as f:
+            body = f.read()
+        deps = [(path, stamp)]
+        gzip_body = None
+        gz_stamp = file_stamp(path + ".gz")
+        if gz_stamp is not None and gz_stamp[0] >= stamp[0]:
+            with open(path + ".gz", "rb") as f:
+                gzip_body = f.read()
+            deps.append((path + ".gz", gz_stamp))
+        return Entry(body, guess_type(path), deps, gzip_body)
+
+    def render(self, rel_path):
+        """Render the page that would be built at `rel_path` from its source."""
+        src_path = os.path.join(self.content_dir, *rel_path.split("/"))
+        src_path = src_path[: -len(".html")] + ".md"
+        stamp = file_stamp(src_path)
+        if stamp is None:
+            return None
+        meta, markdown = read_page(src_path)
+        # Requests are handled on their own threads, away from the build caches
+        # and counters, which a --watch build may be using meanwhile.
+        html, _, _ = render_to_string(
+            meta,
+            markdown,
+            self.template_path,
+            self.urls,
+            caches=False,
+            stats=Counter(),
+            limits=self.limits,
+        )
+        template = page_template_path(meta, self.template_path)
+        deps = [(src_path, stamp), (template, file_stamp(template))]
+        return Entry(html.encode("utf-8"), "text/html; charset=utf-8", deps)
+
+
+class SiteRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SiteServer"
+
+    def do_GET(self):
+        self.respond(head=False)
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def respond(self, head):
+        path = unquote(urlsplit(self.path).path)
+        basepath = self.server.basepath
+        if path + "/" == basepath:
+            return self.redirect(basepath)
+        if not path.startswith(basepath):
+            return self.send_empty(HTTPStatus.NOT_FOUND)
+        rel_path = posixpath.normpath(path[len(basepath) :] or ".")
+        if rel_path.startswith("..") or rel_path.startswith("/"):
+            return self.send_empty(HTTPStatus.NOT_FOUND)
+        if rel_path == ".":
+            rel_path = ""
+        if path.endswith("/") or rel_path == "":
+            rel_path = posixpath.join(rel_path, "index.html")
+
+        try:
+            entry = self.server.cache.get(rel_path)
+            if entry is None and not rel_path.endswith("index.html"):
+                if self.server.cache.get(rel_path + "/index.html") is not None:
+                    return self.redirect(path + "/")
+        except Exception as e:
+            self.log_error("Failed to render %s: %s", rel_path, e)
+            return self.send_empty(HTTPStatus.INTERNAL_SERVER_ERROR)
+        if entry is None:
+            return self.send_empty(HTTPStatus.NOT_FOUND)
+
+        body, etag = entry.body, entry.etag
+        use_gzip = entry.gzip_body is not None and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        )
+        if use_gzip:
+            body, etag = entry.gzip_body, entry.gzip_etag
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(entry, etag, rel_path)
+            return self.end_headers()
+
+        self.send_response(HTTPStatus.OK)
+        self.send_common_headers(entry, etag, rel_path)
+        self.send_header("Content-Type", entry.content_type)
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_common_headers(self, entry, etag, rel_path):
+        self.send_header("ETag", etag)
+        if rel_path in self.server.cache.immutable:
+            self.send_header("Cache-Control", IMMUTABLE)
+        else:
+            self.send_header("Cache-Control", "no-cache")
+        if entry.gzip_body is not None:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def redirect(self, location):
+        self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_empty(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+class SiteServer(ThreadingHTTPServer):
+    """Serves a SiteCache over HTTP/1.1, one thread per connection."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, cache: SiteCache, verbose=False):
+        super().__init__(address, SiteRequestHandler)
+        self.cache = cache
+        self.basepath = cache.urls.basepath
+        self.verbose = verbose
+
+
+def serve(cache: SiteCache, host="127.0.0.1", port=8888, verbose=False):
+    with SiteServer((host, port), cache, verbose) as server:
+        print(f"Serving {cache.dest_dir} at http://{host}:{port}{server.basepath}")
+        server.serve_forever()
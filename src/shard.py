@@ -0,0 +1,139 @@
+import hashlib
+import os
+
+SHARDS_DIR = "shards"
+
+
+def parse_shard(value):
+    """Parse "i/N" into (i, N); shards are numbered from 1."""
+    index, _, count = value.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"expected a shard as i/N, got {value!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"shard {value} is out of range")
+    return index, count
+
+
+def shard_dir(shard, root=SHARDS_DIR):
+    return os.path.join(root, f"{shard[0]}-of-{shard[1]}")
+
+
+def shard_of(src_path, content_dir, count):
+    """Return the shard, of `count`, that renders `src_path`.
+
+    The shard depends only on the path relative to `content_dir`, so every
+    machine agrees on it whatever its checkout location.
+    """
+    rel_path = os.path.relpath(src_path, content_dir).replace(os.sep, "/")
+    digest = hashlib.blake2b(rel_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def select_shard(pages, content_dir, shard):
+    index, count = shard
+    return [page for page in pages if shard_of(page[0], content_dir, count) == index]
+
+
+def check_shards(shard_dirs, manifests):
+    """Return problems with the set of shards: mixed splits, gaps, repeats."""
+    problems = []
+    for path, manifest in zip(shard_dirs, manifests):
+        if manifest.shard is None:
+            problems.append(f"{path} is not a shard build")
+    shards = [tuple(m.shard) for m in manifests if m.shard is not None]
+    counts = sorted({count for _, count in shards})
+    if len(counts) > 1:
+        problems.append(f"shards come from different splits: {counts}")
+    elif counts:
+        count = counts[0]
+        indices = [index for index, _ in shards]
+        for index in range(1, count + 1):
+            if indices.count(index) == 0:
+                problems.append(f"shard {index}/{count} is missing")
+            elif indices.count(index) > 1:
+                problems.append(f"shard {index}/{count} is given more than once")
+    return problems
+
+
+def merge_shards(
+    shard_dirs,
+    dest_dir="docs",
+    content_dir="content",
+    static_dir="static",
+    checksum=False,
+    link=False,
+):
+    """Combine the outputs of shard builds and the static files into `dest_dir`.
+
+    Every shard of one split must be given once, every page in `content_dir`
+    must have been built by the shard it belongs to, and no two pages or a
+    page and a static file may write the same output; otherwise BuildError
+    lists the problems and `dest_dir` is left alone. The merged manifest is
+    kept next to `dest_dir`, so merging again only copies pages whose entry
+    changed and removes pages that are gone.
+    """
+    from build import BuildError, collect_pages, remove_output, sync_static
+    from manifest import BuildManifest
+    from scan import scan_tree, tree_order
+    from sync import copy_file
+
+    manifests = [BuildManifest.load(BuildManifest.path_for(d)) for d in shard_dirs]
+    problems = check_shards(shard_dirs, manifests)
+    if problems:
+        raise BuildError("cannot merge shards:\n  " + "\n  ".join(problems))
+
+    pages = {}
+    owners = {}
+    for path, manifest in zip(shard_dirs, manifests):
+        index, count = manifest.shard
+        for src_path, entry in sorted(manifest.pages.items()):
+            rel_path = os.path.normpath(entry["output"])
+            output = os.path.join(dest_dir, rel_path)
+            shard_output = os.path.join(path, rel_path)
+            if os.path.isabs(rel_path) or rel_path.split(os.sep)[0] == os.pardir:
+                problems.append(f"{src_path} has an output outside {path}")
+                continue
+            if not os.path.isfile(shard_output):
+                problems.append(f"{src_path} has no output in {path}")
+            if shard_of(src_path, content_dir, count) != index:
+                problems.append(f"{src_path} was built by shard {index}/{count}")
+            if output in owners:
+                other = owners[output]
+                problems.append(f"{src_path} and {other} both write {rel_path}")
+            owners[output] = src_path
+            pages[src_path] = (shard_output, {**entry, "output": rel_path})
+
+    # The sync below copies exactly these files.
+    static_files = scan_tree(static_dir)
+    for rel_path in sorted(static_files, key=tree_order):
+        owner = owners.get(os.path.join(dest_dir, rel_path))
+        if owner is not None:
+            problems.append(f"{owner} and {static_dir} both write {rel_path}")
+
+    expected = {src for src, _ in collect_pages(content_dir, dest_dir)}
+    for src_path in sorted(expected - pages.keys()):
+        problems.append(f"{src_path} was not built by any shard")
+    for src_path in sorted(pages.keys() - expected):
+        problems.append(f"{src_path} was built but is not in {content_dir}")
+    if problems:
+        raise BuildError("cannot merge shards:\n  " + "\n  ".join(problems))
+
+    merged = BuildManifest.load(BuildManifest.path_for(dest_dir))
+    for stale_output in merged.remove_stale(pages.keys()):
+        remove_output(stale_output, dest_dir)
+    sync_static(static_dir, dest_dir, merged, checksum, link, static_files)
+    copied = 0
+    try:
+        for src_path, (shard_output, entry) in sorted(pages.items()):
+            if not merged.is_fresh(src_path, entry):
+                copy_file(shard_output, merged.output_path(entry), link)
+                copied += 1
+            merged.record(src_path, entry)
+    finally:
+        merged.save()
+    print(
+        f"Merged {len(manifests)} shards: {copied} pages copied, "
+        f"{len(pages) - copied} up to date"
+    )
@@ -0,0 +1,195 @@
+import json
+import os
+import re
+import time
+from collections import Counter
+from cache import open_database
+from compress import remove_sibling
+from htmlnode import escape_text
+
+WORD_RE = re.compile(r"\w+")
+SEARCH_INDEX = "search-index.json"
+SITEMAP = "sitemap.xml"
+
+
+def page_url(dest_path, dest_dir, basepath="/"):
+    """Map an output path to its URL, serving `index.html` as its directory."""
+    rel_path = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if rel_path == "index.html":
+        rel_path = ""
+    elif rel_path.endswith("/index.html"):
+        rel_path = rel_path[: -len("index.html")]
+    return basepath + rel_path
+
+
+def parent_url(url):
+    return url[: url.rstrip("/").rfind("/") + 1]
+
+
+def format_postings(term, postings):
+    flat = [value for posting in sorted(postings) for value in posting]
+    return json.dumps(term) + ":" + json.dumps(flat, separators=(",", ":"))
+
+
+def write_atomic(path, chunks):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.writelines(chunks)
+    os.replace(tmp_path, path)
+    remove_sibling(path)
+
+
+class SiteIndex:
+    """Per-page titles, word counts and search postings collected during builds.
+
+    Kept in SQLite next to the destination directory, e.g. `docs` is indexed
+    in `.docs-index.sqlite`, so an incremental build only updates the pages
+    it regenerates, and postings are sorted on disk rather than in memory.
+    """
+
+    def __init__(self, path, dest_dir, basepath="/"):
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.db = open_database(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                source TEXT PRIMARY KEY, url TEXT, title TEXT, words INTEGER,
+                modified INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT, source TEXT, count INTEGER, PRIMARY KEY (term, source)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_source ON postings (source);
+            CREATE TABLE IF NOT EXISTS listings (url TEXT PRIMARY KEY);
+            """
+        )
+
+    @staticmethod
+    def path_for(dest_dir):
+        dest_dir = os.path.normpath(dest_dir)
+        parent, name = os.path.split(dest_dir)
+        return os.path.join(parent, f".{name}-index.sqlite")
+
+    def has(self, src_path):
+        row = self.db.execute("SELECT 1 FROM pages WHERE source = ?", (src_path,))
+        return row.fetchone() is not None
+
+    def add(self, src_path, dest_path, title, text):
+        counts = Counter(WORD_RE.findall(text.lower()))
+        self.db.execute("DELETE FROM postings WHERE source = ?", (src_path,))
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (
+                src_path,
+                page_url(dest_path, self.dest_dir, self.basepath),
+                title,
+                counts.total(),
+                os.stat(src_path).st_mtime_ns,
+            ),
+        )
+        self.db.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            ((term, src_path, count) for term, count in counts.items()),
+        )
+
+    def retain(self, src_paths):
+        """Forget the pages whose source is not in `src_paths`."""
+        for (src_path,) in self.db.execute("SELECT source FROM pages").fetchall():
+            if src_path not in src_paths:
+                self.db.execute("DELETE FROM pages WHERE source = ?", (src_path,))
+                self.db.execute("DELETE FROM postings WHERE source = ?", (src_path,))
+
+    def pages(self):
+        """Return (url, title, words, modified) rows ordered by URL."""
+        return self.db.execute(
+            "SELECT url, title, words, modified FROM pages ORDER BY url"
+        ).fetchall()
+
+    def iter_search_index(self):
+        """Yield a JSON search index in chunks.
+
+        `pages` lists [url, title, words] and `terms` maps each term to flat
+        [page, count, page, count, ...] postings, page being an index into
+        `pages`. Postings are read back one term at a time.
+        """
+        ids = {}
+        yield '{"pages":['
+        rows = self.db.execute(
+            "SELECT source, url, title, words FROM pages ORDER BY url"
+        )
+        for i, (src_path, url, title, words) in enumerate(rows):
+            ids[src_path] = i
+            yield ("," if i else "") + json.dumps(
+                [url, title, words], separators=(",", ":")
+            )
+        yield '],"terms":{'
+        term = None
+        postings = []
+        separator = ""
+        rows = self.db.execute(
+            "SELECT term, source, count FROM postings ORDER BY term"
+        )
+        for row_term, src_path, count in rows:
+            if row_term != term:
+                if postings:
+                    yield separator + format_postings(term, postings)
+                    separator = ","
+                term = row_term
+                postings = []
+            postings.append((ids[src_path], count))
+        if postings:
+            yield separator + format_postings(term, postings)
+        yield "}}\n"
+
+    def iter_sitemap(self, site_url=""):
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for url, _, _, modified in self.pages():
+            lastmod = time.strftime("%Y-%m-%d", time.gmtime(modified / 1e9))
+            yield (
+                f"  <url><loc>{escape_text(site_url + url)}</loc>"
+                f"<lastmod>{lastmod}</lastmod></url>\n"
+            )
+        yield "</urlset>\n"
+
+    def listings(self):
+        """Return {directory URL: [(URL, title)]} for directories without a page.
+
+        Directories above a page get a listing of the pages and listed
+        directories directly inside them, up to the first one with a page.
+        """
+        titles = {url: title for url, title, _, _ in self.pages()}
+        listings = {}
+        for url in sorted(titles):
+            child, title = url, titles[url]
+            while child != self.basepath and child.startswith(self.basepath):
+                parent = parent_url(child)
+                if parent in titles:
+                    break
+                entries = listings.setdefault(parent, [])
+                entries.append((child, title))
+                if len(entries) > 1:
+                    break
+                child, title = parent, parent.rstrip("/").rsplit("/", 1)[-1]
+        return listings
+
+    def replace_listings(self, urls):
+        """Record the listing URLs of this build and return the stale ones."""
+        old = {url for (url,) in self.db.execute("SELECT url FROM listings")}
+        pages = {url for url, _, _, _ in self.pages()}
+        self.db.execute("DELETE FROM listings")
+        self.db.executemany("INSERT INTO listings VALUES (?)", ((u,) for u in urls))
+        return sorted(old - set(urls) - pages)
+
+    def listing_output(self, url):
+        rel_path = url[len(self.basepath) :]
+        return os.path.join(self.dest_dir, *rel_path.split("/")[:-1], "index.html")
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sys
+from manifest import file_hash
+from scan import scan_tree
+
+BIG_FILE_SIZE = 1 << 20
+FICLONE = 0x40049409
+
+
+def reflink(src_path, dst_path):
+    import fcntl
+
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+
+def copy_file(src_path, dst_path, link=False):
+    """Copy `src_path` over `dst_path`, atomically replacing it.
+
+    With `link`, a reflink and then a hard link are tried before falling back
+    to a copy, so files on the same filesystem share their data blocks.
+    """
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = dst_path + ".tmp"
+    if link:
+        if sys.platform == "linux":
+            try:
+                reflink(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+                return
+            except OSError:
+                pass
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+
+
+def is_up_to_date(src_path, size, mtime_ns, dst_path, checksum=False):
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return False
+    if size != dst_stat.st_size:
+        return False
+    if checksum:
+        return file_hash(src_path) == file_hash(dst_path)
+    return mtime_ns == dst_stat.st_mtime_ns
+
+
+def remove_empty_dirs(paths, root):
+    """Remove the directories above the removed `paths` that are left empty,
+    deepest first, up to but excluding `root`."""
+    root = os.path.normpath(root)
+    for dir_path in sorted({os.path.dirname(path) for path in paths}, reverse=True):
+        while os.path.normpath(dir_path) != root:
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                break
+            dir_path = os.path.dirname(dir_path)
+
+
+def sync_tree(
+    src, dst, previous=None, checksum=False, link=False, workers=8, files=None
+):
+    """Mirror the files under `src` into `dst`, copying only what changed.
+
+    Files are compared by size and mtime, or by content hash with `checksum`.
+    `previous` maps the relative paths synced by the last run to their
+    (size, mtime_ns); those no longer in `src` are removed from `dst`, which
+    leaves generated pages alongside them untouched, along with directories
+    that become empty. `files` is a scan_tree
+    of `src` when the caller already has one. Returns the new mapping and a
+    (copied, unchanged, removed) tuple of counts.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    previous = previous or {}
+    files = scan_tree(src) if files is None else files
+    assets = {}
+    copied = unchanged = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for rel_path, (size, mtime_ns, _) in files.items():
+            src_path = os.path.join(src, rel_path)
+            dst_path = os.path.join(dst, rel_path)
+            assets[rel_path] = [size, mtime_ns]
+            if is_up_to_date(src_path, size, mtime_ns, dst_path, checksum):
+                unchanged += 1
+                continue
+            copied += 1
+            if size >= BIG_FILE_SIZE:
+                futures.append(executor.submit(copy_file, src_path, dst_path, link))
+            else:
+                copy_file(src_path, dst_path, link)
+        for future in futures:
+            future.result()
+
+    removed = []
+    for rel_path in previous:
+        if rel_path in assets:
+            continue
+        dst_path = os.path.join(dst, rel_path)
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+            removed.append(dst_path)
+    remove_empty_dirs(removed, dst)
+    return assets, (copied, unchanged, len(removed))
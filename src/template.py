@@ -0,0 +1,82 @@
+import os
+import re
+from urls import UrlResolver
+
+SLOT_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+URL_ATTR_RE = re.compile(r'\b(href|src)="([^"]*)"')
+
+
+class Template:
+    """A template parsed into literal segments and named `{{ Slot }}`s.
+
+    `segments` alternates literal text (even indexes) and slot names (odd
+    indexes), so rendering is a join over precomputed strings.
+    """
+
+    def __init__(self, source: str):
+        self.segments = []
+        self.raw_slots = {}
+        start = 0
+        for match in SLOT_RE.finditer(source):
+            self.segments.append(source[start : match.start()])
+            self.segments.append(match.group(1))
+            self.raw_slots[match.group(1)] = match.group(0)
+            start = match.end()
+        self.segments.append(source[start:])
+
+    @property
+    def slots(self):
+        return self.segments[1::2]
+
+    def resolve_urls(self, urls: UrlResolver):
+        """Return a copy with `href`/`src` attributes of the literal parts resolved."""
+        def resolve(match):
+            return f'{match.group(1)}="{urls(match.group(2))}"'
+
+        resolved = Template("")
+        resolved.raw_slots = self.raw_slots
+        resolved.segments = [
+            segment if i % 2 else URL_ATTR_RE.sub(resolve, segment)
+            for i, segment in enumerate(self.segments)
+        ]
+        return resolved
+
+    def render(self, values: dict):
+        return "".join(self.iter_render(values))
+
+    def iter_render(self, values: dict):
+        """Yield the rendered template.
+
+        Slot values are either strings or iterables of string fragments, which
+        are streamed through; slots without a value are left as written.
+        """
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                yield segment
+            elif segment not in values:
+                yield self.raw_slots[segment]
+            elif isinstance(values[segment], str):
+                yield values[segment]
+            else:
+                yield from values[segment]
+
+    def write(self, fp, values: dict):
+        for fragment in self.iter_render(values):
+            fp.write(fragment)
+
+
+_cache = {}
+
+
+def load_template(path, urls: UrlResolver | None = None):
+    """Load and parse `path`, reusing the parsed template until its mtime changes."""
+    urls = urls or UrlResolver()
+    key = (os.path.abspath(path), urls.key)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        template = Template(f.read()).resolve_urls(urls)
+    _cache[key] = (mtime, template)
+    return template
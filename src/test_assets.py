@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from assets import AssetHashes, fingerprint_assets, fingerprinted_path
+from build import build_site
+from manifest import file_hash
+from testing import TempTreeTestCase
+
+
+class TestAssets(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(
+            fingerprinted_path(os.path.join("img", "a.png"), "0123456789abcdef"),
+            os.path.join("img", "a.0123456789.png"),
+        )
+        self.assertEqual(
+            fingerprinted_path("LICENSE", "abcdef0123456"), "LICENSE.abcdef0123"
+        )
+
+    def test_fingerprint_assets(self):
+        css = self.write("static/index.css", "body {}")
+        self.write("static/images/a.png", "png")
+        digest = file_hash(css)[:10]
+        assets, counts = fingerprint_assets(self.static, self.dest)
+        self.assertEqual(assets["/index.css"], f"/index.{digest}.css")
+        self.assertEqual(counts, (2, 0, 0, 2))
+        with open(os.path.join(self.dest, f"index.{digest}.css")) as f:
+            self.assertEqual(f.read(), "body {}")
+        with open(os.path.join(self.dest, "asset-manifest.json")) as f:
+            self.assertEqual(json.load(f), assets)
+
+        self.assertEqual(fingerprint_assets(self.static, self.dest)[1], (0, 2, 0, 0))
+
+        self.write("static/index.css", "body { margin: 0 }")
+        assets, counts = fingerprint_assets(self.static, self.dest)
+        self.assertEqual(counts, (1, 1, 1, 1))
+        old_copy = os.path.join(self.dest, f"index.{digest}.css")
+        self.assertFalse(os.path.exists(old_copy))
+
+    def test_hashes_reused_by_mtime(self):
+        path = self.write("static/a.txt", "a")
+        hashes = AssetHashes(os.path.join(self.root, "hashes.json"))
+        hashes.update(self.static)
+        stat = os.stat(path)
+        hashes.files["a.txt"][2] = "cached"
+        hashes.update(self.static)
+        self.assertEqual(hashes.files["a.txt"][2], "cached")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        hashes.update(self.static)
+        self.assertEqual(hashes.files["a.txt"][2], file_hash(path))
+
+    def test_build_links_fingerprinted_assets(self):
+        content = os.path.join(self.root, "content")
+        template = self.write(
+            "template.html",
+            '<link href="/index.css" /><main>{{ Content }}</main>',
+        )
+        self.write("static/index.css", "body {}")
+        self.write("static/images/a.png", "png")
+        self.write("content/index.md", "# Home\n\n![a](/images/a.png)")
+
+        def build(**kwargs):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/site/", content, self.static, template, self.dest, **kwargs
+                )
+            with open(os.path.join(self.dest, "index.html")) as f:
+                return f.read()
+
+        html = build(fingerprint=True)
+        with open(os.path.join(self.dest, "asset-manifest.json")) as f:
+            assets = json.load(f)
+        self.assertIn(f'href="/site{assets["/index.css"]}"', html)
+        self.assertIn(f'src="/site{assets["/images/a.png"]}"', html)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.css")))
+
+        self.write("static/index.css", "body { margin: 0 }")
+        with open(os.path.join(self.dest, "asset-manifest.json")) as f:
+            old_css = json.load(f)["/index.css"]
+        html = build(fingerprint=True, incremental=True)
+        self.assertNotIn(old_css, html)
+
+        self.assertIn('href="/site/index.css"', build())
+
+    def test_build_without_fingerprint_removes_copies(self):
+        content = os.path.join(self.root, "content")
+        template = self.write("template.html", "<main>{{ Content }}</main>")
+        self.write("static/index.css", "body {}")
+        self.write("content/index.md", "# Home")
+        for fingerprint in (True, False):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/",
+                    content,
+                    self.static,
+                    template,
+                    self.dest,
+                    incremental=True,
+                    fingerprint=fingerprint,
+                )
+        self.assertEqual(sorted(os.listdir(self.dest)), ["index.css", "index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
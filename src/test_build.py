@@ -0,0 +1,448 @@
+import io
+import json
+import os
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+from unittest import mock
+
+from build import (
+    BuildError,
+    build_site,
+    collect_pages,
+    configure_caches,
+    configure_limits,
+    generate_pages,
+    page_template_path,
+    split_front_matter,
+)
+from testing import TempTreeTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestGeneratePages(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = self.write(
+            os.path.join(self.root, "template.html"), TEMPLATE
+        )
+
+    def add_page(self, rel_path, markdown):
+        return self.write(os.path.join(self.content, rel_path), markdown)
+
+    def read_output(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as f:
+            return f.read()
+
+    def test_collect_pages(self):
+        self.add_page("index.md", "# Home")
+        self.add_page("blog/b/index.md", "# B")
+        self.add_page("blog/a/index.md", "# A")
+        self.add_page("notes.txt", "not markdown")
+        self.assertEqual(
+            collect_pages(self.content, self.dest),
+            [
+                (
+                    os.path.join(self.content, "blog", "a", "index.md"),
+                    os.path.join(self.dest, "blog", "a", "index.html"),
+                ),
+                (
+                    os.path.join(self.content, "blog", "b", "index.md"),
+                    os.path.join(self.dest, "blog", "b", "index.html"),
+                ),
+                (
+                    os.path.join(self.content, "index.md"),
+                    os.path.join(self.dest, "index.html"),
+                ),
+            ],
+        )
+
+    def test_generate_pages_parallel_matches_serial(self):
+        for i in range(8):
+            self.add_page(f"p{i}/index.md", f"# Page {i}\n\nSome **bold** text")
+        pages = collect_pages(self.content, self.dest)
+
+        serial_log = io.StringIO()
+        with redirect_stdout(serial_log):
+            list(generate_pages("/", pages, self.template))
+        serial = [self.read_output(f"p{i}/index.html") for i in range(8)]
+
+        parallel_log = io.StringIO()
+        with redirect_stdout(parallel_log):
+            done = list(generate_pages("/", pages, self.template, jobs=3))
+        self.assertEqual(done, pages)
+        self.assertEqual(parallel_log.getvalue(), serial_log.getvalue())
+        self.assertEqual(
+            [self.read_output(f"p{i}/index.html") for i in range(8)], serial
+        )
+
+    def test_generate_pages_pipelined_matches_serial(self):
+        for i in range(40):
+            self.add_page(f"p{i:02d}/index.md", f"# Page {i}\n\n[link](/p{i})")
+        pages = collect_pages(self.content, self.dest)
+
+        serial_log = io.StringIO()
+        with redirect_stdout(serial_log):
+            list(generate_pages("/", pages, self.template))
+        serial = [self.read_output(f"p{i:02d}/index.html") for i in range(40)]
+
+        pipelined_log = io.StringIO()
+        with redirect_stdout(pipelined_log):
+            done = list(generate_pages("/", pages, self.template, io_threads=2))
+        self.assertEqual(done, pages)
+        self.assertEqual(pipelined_log.getvalue(), serial_log.getvalue())
+        self.assertEqual(
+            [self.read_output(f"p{i:02d}/index.html") for i in range(40)], serial
+        )
+
+    def test_generate_pages_pipelined_writes_pages_before_error(self):
+        self.add_page("a/index.md", "# A")
+        self.add_page("b/index.md", "# B")
+        self.add_page("c/index.md", "no title")
+        self.add_page("d/index.md", "# D")
+        pages = collect_pages(self.content, self.dest)
+        configure_limits(strict=True)
+        self.addCleanup(configure_limits)
+        done = []
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaisesRegex(BuildError, "c/index.md"):
+                for page in generate_pages("/", pages, self.template, io_threads=2):
+                    done.append(page)
+        self.assertEqual(done, pages[:2])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "d", "index.html")))
+
+    def test_generate_pages_reports_first_error(self):
+        self.add_page("a/index.md", "# A")
+        self.add_page("b/index.md", "# B\n\n**unclosed")
+        self.add_page("c/index.md", "no title")
+        pages = collect_pages(self.content, self.dest)
+        configure_limits(strict=True)
+        self.addCleanup(configure_limits)
+        for jobs, io_threads in ((1, 0), (2, 0), (1, 2)):
+            with redirect_stdout(io.StringIO()):
+                with self.assertRaisesRegex(BuildError, "b/index.md"):
+                    list(
+                        generate_pages(
+                            "/", pages, self.template, jobs=jobs, io_threads=io_threads
+                        )
+                    )
+
+    def test_degrades_to_plain_text(self):
+        self.add_page("a/index.md", "# A\n\n**unclosed <b>\n\nfine *text*")
+        self.add_page("b/index.md", "# B\n\n" + "long " * 100)
+        self.add_page("c/index.md", "# C\n\nok")
+        self.add_page("d/index.md", "no <title>")
+        pages = collect_pages(self.content, self.dest)
+        configure_limits(max_page_chars=100)
+        self.addCleanup(configure_limits)
+        for jobs, io_threads in ((1, 0), (2, 0), (1, 2)):
+            stats = Counter()
+            log = io.StringIO()
+            with redirect_stdout(log):
+                list(
+                    generate_pages(
+                        "/", pages, self.template, jobs, None, stats, io_threads
+                    )
+                )
+            self.assertEqual(
+                self.read_output("a/index.html"),
+                "<title>A</title><body><div><h1>A</h1>"
+                "<p>**unclosed &lt;b&gt;</p><p>fine <i>text</i></p></div></body>",
+            )
+            self.assertIn("<pre># B\n\nlong long", self.read_output("b/index.html"))
+            self.assertEqual(
+                self.read_output("d/index.html"),
+                "<title>Untitled</title>"
+                "<body><div><p>no &lt;title&gt;</p></div></body>",
+            )
+            self.assertEqual(
+                stats,
+                Counter(
+                    {"malformed_blocks": 1, "oversized_pages": 1, "untitled_pages": 1}
+                ),
+            )
+            lines = log.getvalue().splitlines()
+            self.assertIn("a/index.md has 1 malformed blocks", lines[1])
+            self.assertIn("b/index.md is over the size limit", lines[3])
+            self.assertIn("d/index.md has no # heading", lines[6])
+
+    def test_streamed_page_failure_leaves_no_output(self):
+        self.add_page("a/index.md", "# A\n\nfine\n\n**unclosed")
+        configure_limits(strict=True)
+        self.addCleanup(configure_limits)
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(BuildError):
+                list(
+                    generate_pages(
+                        "/", collect_pages(self.content, self.dest), self.template
+                    )
+                )
+        self.assertEqual(os.listdir(os.path.join(self.dest, "a")), [])
+
+    def test_time_limit(self):
+        self.add_page("a/index.md", "# A\n\n" + "- item\n" * 1000)
+        pages = collect_pages(self.content, self.dest)
+        configure_limits(max_page_seconds=1e-9)
+        self.addCleanup(configure_limits)
+        for jobs, io_threads in ((1, 0), (2, 0), (1, 2)):
+            stats = Counter()
+            with redirect_stdout(io.StringIO()):
+                list(
+                    generate_pages(
+                        "/", pages, self.template, jobs, None, stats, io_threads
+                    )
+                )
+            self.assertEqual(stats, Counter({"slow_pages": 1}))
+            output = self.read_output("a/index.html")
+            self.assertEqual(output.count("<div>"), 1)
+            self.assertIn("<pre># A\n\n- item", output)
+
+    def test_front_matter_selects_template(self):
+        self.write(
+            os.path.join(self.root, "post.html"), "<article>{{ Content }}</article>"
+        )
+        self.add_page("a/index.md", "---\ntemplate: post.html\n---\n# A")
+        self.add_page("b/index.md", "# B")
+        log = io.StringIO()
+        with redirect_stdout(log):
+            list(
+                generate_pages(
+                    "/", collect_pages(self.content, self.dest), self.template
+                )
+            )
+        self.assertEqual(
+            self.read_output("a/index.html"), "<article><div><h1>A</h1></div></article>"
+        )
+        self.assertTrue(log.getvalue().splitlines()[0].endswith("post.html"))
+        self.assertEqual(
+            self.read_output("b/index.html"),
+            "<title>B</title><body><div><h1>B</h1></div></body>",
+        )
+
+    def test_front_matter_template_must_stay_in_template_dir(self):
+        secret = self.write(os.path.join(self.root, "secret.txt"), "secret")
+        template_path = os.path.join(self.root, "t", "template.html")
+        for template in (secret, "../secret.txt", "x/../../secret.txt"):
+            with self.assertRaisesRegex(ValueError, "is outside"):
+                page_template_path({"template": template}, template_path)
+        self.assertEqual(
+            page_template_path({"template": "x/../post.html"}, template_path),
+            os.path.join(self.root, "t", "x/../post.html"),
+        )
+
+        self.add_page("a/index.md", f"---\ntemplate: {secret}\n---\n# A")
+        pages = collect_pages(self.content, self.dest)
+        for jobs, io_threads in ((1, 0), (2, 0), (1, 2)):
+            with redirect_stdout(io.StringIO()):
+                with self.assertRaisesRegex(BuildError, "is outside"):
+                    list(
+                        generate_pages(
+                            "/", pages, self.template, jobs, None, None, io_threads
+                        )
+                    )
+        static = os.path.join(self.root, "static")
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaisesRegex(BuildError, "is outside"):
+                build_site("/", self.content, static, self.template, self.dest)
+
+    def test_page_cache_survives_template_change(self):
+        self.add_page("a/index.md", "# A\n\n**bold**")
+        pages = collect_pages(self.content, self.dest)
+        configure_caches(page_cache_db=os.path.join(self.root, "pages.sqlite"))
+        self.addCleanup(configure_caches)
+
+        stats = Counter()
+        with redirect_stdout(io.StringIO()):
+            list(generate_pages("/", pages, self.template, stats=stats))
+            self.write(self.template, "<main>{{ Content }}</main>", touch=True)
+            list(generate_pages("/", pages, self.template, stats=stats))
+        self.assertEqual(stats, Counter({"page_hits": 1, "page_misses": 1}))
+        self.assertEqual(
+            self.read_output("a/index.html"),
+            "<main><div><h1>A</h1><p><b>bold</b></p></div></main>",
+        )
+
+    def test_index_is_kept_across_incremental_builds(self):
+        self.add_page("index.md", "# Home\n\nWelcome home")
+        self.add_page("blog/a/index.md", "# A\n\nFirst **post**")
+        static = os.path.join(self.root, "static")
+        os.makedirs(static)
+
+        def build(incremental=False):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/",
+                    self.content,
+                    static,
+                    self.template,
+                    self.dest,
+                    incremental=incremental,
+                    index=True,
+                )
+
+        build()
+        self.add_page("blog/b/index.md", "# B\n\nSecond post")
+        build(incremental=True)
+        with open(os.path.join(self.dest, "search-index.json")) as f:
+            data = json.load(f)
+        self.assertEqual(
+            data["pages"],
+            [["/", "Home", 3], ["/blog/a/", "A", 3], ["/blog/b/", "B", 3]],
+        )
+        self.assertEqual(data["terms"]["post"], [1, 1, 2, 1])
+        self.assertIn('<a href="/blog/b/">B</a>', self.read_output("blog/index.html"))
+        self.assertIn("<loc>/blog/a/</loc>", self.read_output("sitemap.xml"))
+
+    def test_index_outputs_are_removed_without_index(self):
+        self.add_page("index.md", "# Home")
+        self.add_page("blog/a/index.md", "# \n\nNo title")
+        static = os.path.join(self.root, "static")
+
+        def build(**kwargs):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/", self.content, static, self.template, self.dest, **kwargs
+                )
+
+        build(index=True)
+        self.assertIn(
+            '<a href="/blog/a/">Untitled</a>', self.read_output("blog/index.html")
+        )
+        build(incremental=True)
+        for name in ("search-index.json", "sitemap.xml", "blog/index.html"):
+            self.assertFalse(os.path.exists(os.path.join(self.dest, name)))
+        self.assertEqual(self.read_output("blog/a/index.html").count("No title"), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, ".docs-index.sqlite")))
+
+    def test_index_keeps_pages_generated_before_a_failure(self):
+        self.add_page("a/index.md", "# A\n\nold")
+        static = os.path.join(self.root, "static")
+
+        def build(**kwargs):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/",
+                    self.content,
+                    static,
+                    self.template,
+                    self.dest,
+                    incremental=True,
+                    index=True,
+                    **kwargs,
+                )
+
+        build()
+        self.add_page("a/index.md", "# A\n\nnew")
+        bad = self.add_page("b/index.md", "# B\n\n**unclosed")
+        with self.assertRaises(BuildError):
+            build(strict=True)
+        os.remove(bad)
+        build()
+        with open(os.path.join(self.dest, "search-index.json")) as f:
+            terms = json.load(f)["terms"]
+        self.assertIn("new", terms)
+        self.assertNotIn("old", terms)
+
+    def test_incremental_build_trusts_unchanged_source_stats(self):
+        path = self.add_page("a/index.md", "# A\n\nold")
+        static = os.path.join(self.root, "static")
+
+        def build(**kwargs):
+            log = io.StringIO()
+            with redirect_stdout(log):
+                build_site(
+                    "/", self.content, static, self.template, self.dest, **kwargs
+                )
+            return log.getvalue()
+
+        build()
+        stat = os.stat(path)
+        with open(path, "r+") as f:
+            f.write("# A\n\nnew")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIn("0 pages generated", build(incremental=True))
+        self.assertIn("1 pages generated", build(incremental=True, checksum=True))
+        self.assertIn("new", self.read_output("a/index.html"))
+
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertIn("0 pages generated", build(incremental=True))
+
+    def test_incremental_build_follows_parser_and_limits(self):
+        self.add_page("a/index.md", "# A")
+        static = os.path.join(self.root, "static")
+
+        def build(**kwargs):
+            log = io.StringIO()
+            with redirect_stdout(log):
+                build_site(
+                    "/", self.content, static, self.template, self.dest, True, **kwargs
+                )
+            return log.getvalue()
+
+        self.assertIn("1 pages generated", build())
+        self.assertIn("0 pages generated", build())
+        self.assertIn("1 pages generated", build(strict=True))
+        self.assertIn("1 pages generated", build(max_page_chars=1))
+        self.assertIn("1 pages generated", build(max_page_seconds=5))
+        self.assertIn("0 pages generated", build(max_page_seconds=5))
+        with mock.patch("build.PARSER_VERSION", -1):
+            self.assertIn("1 pages generated", build(max_page_seconds=5))
+
+    def test_compress_keeps_static_gz_files(self):
+        self.add_page("index.md", "# Home")
+        static = os.path.join(self.root, "static")
+        self.write(os.path.join(static, "dl", "data.gz"), "archive")
+        for incremental in (False, True):
+            log = io.StringIO()
+            with redirect_stdout(log):
+                build_site(
+                    "/",
+                    self.content,
+                    static,
+                    self.template,
+                    self.dest,
+                    incremental=incremental,
+                    compress=True,
+                )
+            self.assertIn("0 removed", log.getvalue().splitlines()[-1])
+            self.assertEqual(self.read_output("dl/data.gz"), "archive")
+            self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html.gz")))
+
+    def test_build_without_compress_drops_stale_gz_files(self):
+        self.add_page("index.md", "# Home")
+        self.add_page("about.md", "# About")
+        static = os.path.join(self.root, "static")
+        self.write(os.path.join(static, "index.css"), "body {}")
+        self.write(os.path.join(static, "dl", "notes.txt.gz"), "shipped")
+
+        def build(**kwargs):
+            with redirect_stdout(io.StringIO()):
+                build_site(
+                    "/", self.content, static, self.template, self.dest, **kwargs
+                )
+
+        build(compress=True)
+        self.add_page("index.md", "# Home again")
+        self.write(os.path.join(static, "index.css"), "main {}", touch=True)
+        build(incremental=True)
+        for name in ("index.html.gz", "index.css.gz"):
+            self.assertFalse(os.path.exists(os.path.join(self.dest, name)))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "about.html.gz")))
+        self.assertEqual(self.read_output("dl/notes.txt.gz"), "shipped")
+
+
+class TestSplitFrontMatter(unittest.TestCase):
+    def test_split_front_matter(self):
+        self.assertEqual(
+            split_front_matter("---\ntemplate: post.html\nauthor: me\n---\n# Hi"),
+            ({"template": "post.html", "author": "me"}, "# Hi"),
+        )
+        self.assertEqual(split_front_matter("# Hi\n---\n"), ({}, "# Hi\n---\n"))
+        self.assertEqual(split_front_matter("---\nunclosed"), ({}, "---\nunclosed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
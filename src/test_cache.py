@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from cache import BlockCache, DiskStore, PageCache, remove_database
+from testing import TempTreeTestCase
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_lru(self):
+        cache = BlockCache(maxsize=2)
+        cache.put(b"a", "<p>a</p>")
+        cache.put(b"b", "<p>b</p>")
+        self.assertEqual(cache.get(b"a"), "<p>a</p>")
+        cache.put(b"c", "<p>c</p>")
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(cache.get(b"c"), "<p>c</p>")
+        self.assertEqual(
+            cache.take_stats(), {"hits": 2, "disk_hits": 0, "misses": 1}
+        )
+        self.assertEqual(
+            cache.take_stats(), {"hits": 0, "disk_hits": 0, "misses": 0}
+        )
+
+    def test_disk_store_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "blocks.sqlite")
+            cache = BlockCache(store=DiskStore(path))
+            cache.put(b"a", "<p>a</p>")
+            cache.store.close()
+
+            cache = BlockCache(store=DiskStore(path))
+            self.assertEqual(cache.get(b"a"), "<p>a</p>")
+            self.assertEqual(cache.get(b"a"), "<p>a</p>")
+            self.assertIsNone(cache.get(b"b"))
+            self.assertEqual(
+                cache.take_stats(), {"hits": 1, "disk_hits": 1, "misses": 1}
+            )
+            cache.store.close()
+
+
+class TestPageCache(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, "pages.sqlite")
+
+    def test_roundtrip(self):
+        cache = PageCache(self.path)
+        self.assertIsNone(cache.get(b"a"))
+        cache.put(b"a", ("<div>body</div>", "Title"))
+        cache.close()
+
+        cache = PageCache(self.path)
+        self.assertEqual(cache.get(b"a"), ("<div>body</div>", "Title"))
+        self.assertEqual(cache.take_stats(), {"page_hits": 1, "page_misses": 0})
+        cache.close()
+
+    def test_evicts_least_recently_used(self):
+        cache = PageCache(self.path)
+        for used, key in enumerate((b"a", b"b", b"c")):
+            cache.put(key, ("x" * 1000, key.decode()))
+            cache.db.execute("UPDATE pages SET used = ? WHERE key = ?", (used, key))
+        cache.get(b"a")
+        cache.max_bytes = cache.size() - 1
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get(b"b"))
+        self.assertIsNotNone(cache.get(b"a"))
+        self.assertIsNotNone(cache.get(b"c"))
+        cache.max_bytes = 0
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(cache.size(), 0)
+        cache.close()
+
+    def test_hits_do_not_write(self):
+        cache = PageCache(self.path)
+        cache.put(b"a", ("<div>body</div>", "Title"))
+        cache.flush()
+        self.assertIsNotNone(cache.get(b"a"))
+        self.assertFalse(cache.db.in_transaction)
+        self.assertEqual(cache.used, {})
+
+        cache.db.execute("UPDATE pages SET used = 0")
+        cache.db.commit()
+        cache.get(b"a")
+        self.assertFalse(cache.db.in_transaction)
+        cache.flush()
+        (used,) = cache.db.execute("SELECT used FROM pages").fetchone()
+        self.assertGreater(used, 0)
+        cache.close()
+
+    def test_remove_database(self):
+        PageCache(self.path).close()
+        remove_database(self.path)
+        self.assertEqual(os.listdir(self.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
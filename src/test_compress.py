@@ -0,0 +1,74 @@
+import gzip
+import os
+import unittest
+
+from compress import compress_tree, prune_siblings
+from testing import TempTreeTestCase
+
+
+class TestCompressTree(TempTreeTestCase):
+    def test_compresses_text_files_once(self):
+        page = self.write("blog/index.html", b"<p>ring</p>" * 50)
+        self.write("index.css", b"body {}")
+        self.write("images/logo.png", b"\x89PNG")
+        counts, (before, after) = compress_tree(self.root)
+        self.assertEqual(counts, (2, 0, 0))
+        self.assertEqual(before, 557)
+        self.assertLess(after, before)
+        with gzip.open(page + ".gz") as f:
+            self.assertEqual(f.read(), b"<p>ring</p>" * 50)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "images/logo.png.gz")))
+
+        self.assertEqual(compress_tree(self.root)[0], (0, 2, 0))
+
+    def test_recompresses_changed_and_removes_orphans(self):
+        page = self.write("index.html", b"old")
+        gone = self.write("gone.html", b"gone")
+        compress_tree(self.root)
+        self.write("index.html", b"new")
+        os.utime(page, ns=(0, os.stat(page + ".gz").st_mtime_ns + 1))
+        os.remove(gone)
+        self.assertEqual(compress_tree(self.root)[0], (1, 0, 1))
+        with gzip.open(page + ".gz") as f:
+            self.assertEqual(f.read(), b"new")
+        self.assertFalse(os.path.exists(gone + ".gz"))
+
+    def test_keeps_copied_gz_files(self):
+        data = self.write("dl/data.gz", b"archive")
+        shipped = self.write("dl/notes.txt.gz", b"shipped")
+        self.write("dl/notes.txt", b"notes")
+        other = self.write("dl/other.txt.gz", b"orphan of a text output")
+        keep = {os.path.join("dl", "data.gz"), os.path.join("dl", "notes.txt.gz")}
+        self.assertEqual(compress_tree(self.root, keep=keep)[0], (0, 0, 1))
+        with open(data, "rb") as f:
+            self.assertEqual(f.read(), b"archive")
+        with open(shipped, "rb") as f:
+            self.assertEqual(f.read(), b"shipped")
+        self.assertFalse(os.path.exists(other))
+
+    def test_prune_siblings(self):
+        page = self.write("index.html", b"old")
+        kept = self.write("about.html", b"about")
+        gone = self.write("gone.html", b"gone")
+        compress_tree(self.root)
+        self.write("index.html", b"new", touch=True)
+        os.remove(gone)
+        shipped = self.write("dl/notes.txt.gz", b"shipped")
+        keep = {os.path.join("dl", "notes.txt.gz")}
+        self.assertEqual(prune_siblings(self.root, keep), 2)
+        self.assertFalse(os.path.exists(page + ".gz"))
+        self.assertFalse(os.path.exists(gone + ".gz"))
+        self.assertTrue(os.path.exists(kept + ".gz"))
+        self.assertTrue(os.path.exists(shipped))
+
+    def test_parallel_matches_serial(self):
+        for i in range(40):
+            self.write(f"p{i}/index.html", f"<p>page {i}</p>".encode() * 20)
+        counts, _ = compress_tree(self.root, jobs=2)
+        self.assertEqual(counts, (40, 0, 0))
+        with gzip.open(os.path.join(self.root, "p7/index.html.gz")) as f:
+            self.assertEqual(f.read(), b"<p>page 7</p>" * 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,16 @@
+import io
+import pickle
 import unittest
-from htmlnode import HTMLNode, ParentNode, LeafNode, text_node_to_html_node
+from htmlnode import (
+    EscapedLeafNode,
+    HTMLNode,
+    ParentNode,
+    LeafNode,
+    RawNode,
+    escape_attr,
+    escape_text,
+    text_node_to_html_node,
+)
 from textnode import TextNode, TextType
 
 
@@ -50,6 +61,35 @@ class TestParentNode(unittest.TestCase):
             '<div class="container"><span>Hello</span><div><span>World</span></div></div>',
         )
 
+    def test_iter_html(self):
+        parent = ParentNode(
+            "div",
+            [
+                LeafNode("span", "Hello"),
+                ParentNode("p", [LeafNode(None, "World")], {"class": "text"}),
+            ],
+        )
+        self.assertEqual(
+            list(parent.iter_html()),
+            [
+                "<div>",
+                "<span>Hello</span>",
+                '<p class="text">',
+                "World",
+                "</p>",
+                "</div>",
+            ],
+        )
+        self.assertEqual("".join(parent.iter_html()), parent.to_html())
+
+    def test_write_html(self):
+        parent = ParentNode("div", [LeafNode("b", "Hello"), LeafNode(None, " World")])
+        fp = io.StringIO()
+        parent.write_html(fp)
+        self.assertEqual(fp.getvalue(), "<div><b>Hello</b> World</div>")
+        with self.assertRaises(ValueError):
+            ParentNode("div", [LeafNode("b", "")]).write_html(io.StringIO())
+
 
 class TestLeafNode(unittest.TestCase):
     def test_leafnode(self):
@@ -65,6 +105,43 @@ class TestLeafNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             leaf.to_html()
 
+    def test_escaping(self):
+        leaf = LeafNode("a", 'x < y & "z"', {"href": '/q?a=1&b="2"'})
+        self.assertEqual(
+            leaf.to_html(),
+            '<a href="/q?a=1&amp;b=&quot;2&quot;">x &lt; y &amp; "z"</a>',
+        )
+        leaf = EscapedLeafNode("b", "x &lt; y", {"title": "<"})
+        self.assertEqual(leaf.to_html(), '<b title="&lt;">x &lt; y</b>')
+
+    def test_escape_functions(self):
+        text = "plain text"
+        self.assertIs(escape_text(text), text)
+        self.assertEqual(escape_text("<&>"), "&lt;&amp;&gt;")
+        self.assertEqual(escape_attr('"&'), "&quot;&amp;")
+
+
+class TestRawNode(unittest.TestCase):
+    def test_rawnode(self):
+        raw = RawNode("<p>already <b>rendered</b></p>")
+        self.assertEqual(raw.to_html(), "<p>already <b>rendered</b></p>")
+        parent = ParentNode("div", [raw, LeafNode("i", "x")])
+        self.assertEqual(
+            parent.to_html(), "<div><p>already <b>rendered</b></p><i>x</i></div>"
+        )
+
+
+class TestCompactNodes(unittest.TestCase):
+    def test_no_instance_dict(self):
+        tree = ParentNode(
+            "div", [LeafNode("a", "x", {"href": "/"}), RawNode("<p>y</p>")]
+        )
+        for node in (tree, *tree.children):
+            self.assertFalse(hasattr(node, "__dict__"))
+        copy = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(repr(copy), repr(tree))
+        self.assertEqual(copy.to_html(), tree.to_html())
+
 
 class TestTextNodeToHTMLNode(unittest.TestCase):
     def test_text_node_to_html_node(self):
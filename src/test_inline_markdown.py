@@ -1,4 +1,8 @@
+import glob
+import io
+import os
 import unittest
+from unittest import mock
 from inline_markdown import (
     split_nodes_delimiter,
     extract_markdown_images,
@@ -6,12 +10,19 @@ from inline_markdown import (
     split_nodes_image,
     split_nodes_link,
     text_to_textnodes,
+    lex_inline,
     markdown_to_blocks,
+    iter_blocks,
     block_to_block_type,
     markdown_to_html,
+    markdown_to_html_string,
+    iter_markdown_html,
+    RenderTimeout,
 )
 
 from textnode import TextNode, TextType
+from urls import UrlResolver
+from cache import BlockCache
 
 
 class TestInlineMarkdown(unittest.TestCase):
@@ -180,6 +191,27 @@ class TestInlineMarkdown(unittest.TestCase):
             new_nodes,
         )
 
+    def test_split_links_skips_images(self):
+        node = TextNode("![same](/a.png) then [same](/a.png)", TextType.TEXT)
+        self.assertListEqual(
+            [
+                TextNode("![same](/a.png) then ", TextType.TEXT),
+                TextNode("same", TextType.LINK, "/a.png"),
+            ],
+            split_nodes_link([node]),
+        )
+
+    def test_split_links_many(self):
+        text = " ".join(f"[l{i}](/p/{i})" for i in range(500))
+        nodes = split_nodes_link([TextNode(text, TextType.TEXT)])
+        self.assertEqual(len(nodes), 999)
+        self.assertEqual(nodes[-1], TextNode("l499", TextType.LINK, "/p/499"))
+
+    def test_split_without_brackets_keeps_node(self):
+        node = TextNode("no links here (really)", TextType.TEXT)
+        self.assertIs(split_nodes_image([node])[0], node)
+        self.assertIs(split_nodes_link([node])[0], node)
+
     def test_text_to_textnodes(self):
         nodes = text_to_textnodes(
             "This is **text** with an *italic* word and a `code block` and an ![image](https://i.imgur.com/zjjcJKZ.png) and a [link](https://boot.dev)"
@@ -217,6 +249,28 @@ class TestInlineMarkdown(unittest.TestCase):
             ["Should remove excessive lines", "And strip"],
         )
 
+    def test_markdown_to_blocks_fenced_code(self):
+        markdown = "Intro\n\n```\nfirst\n\n\nsecond\n```\n\nOutro"
+        self.assertEqual(
+            markdown_to_blocks(markdown),
+            ["Intro", "```\nfirst\n\n\nsecond\n```", "Outro"],
+        )
+        self.assertEqual(
+            markdown_to_blocks("```\nunclosed\n\nfence"),
+            ["```\nunclosed", "fence"],
+        )
+
+    def test_iter_blocks(self):
+        lines = io.StringIO("  # Title\n\n\n- a\n- b  \n   \n\n```\nx\n\ny\n```\n")
+        self.assertEqual(
+            list(iter_blocks(lines)),
+            [
+                ("# Title", "header"),
+                ("- a\n- b", "unordered_list"),
+                ("```\nx\n\ny\n```", "code"),
+            ],
+        )
+
     def test_block_to_block_type(self):
         self.assertEqual(block_to_block_type("# Heading 1"), "header")
         self.assertEqual(block_to_block_type("## Heading 2"), "header")
@@ -284,6 +338,170 @@ __italics__
             '<div><h1>Header</h1><p>Paragraph</p><ul><li>list item</li><li>list item</li></ul><p><a href="http://somewhere.com">link</a></p><p><img src="http://somewhere.com" alt="image">image</img></p><p>__italics__</p><p><b>bold</b></p></div>',
         )
 
+    def test_markdown_to_html_resolves_urls(self):
+        markdown = "[home](/index.html) ![logo](/logo.png) [ext](https://x.com)\n\n`href=\"/raw\"`"
+        self.assertEqual(
+            markdown_to_html(markdown, UrlResolver("/site/")).to_html(),
+            '<div><p><a href="/site/index.html">home</a> '
+            '<img src="/site/logo.png" alt="logo">logo</img> '
+            '<a href="https://x.com">ext</a></p><p><code>href="/raw"</code></p></div>',
+        )
+
+    def test_markdown_to_html_escapes(self):
+        markdown = '# A & B\n\n[< Back](/?a=1&b=2) `<br>` and **x > y**\n\nsafe "quote"'
+        self.assertEqual(
+            markdown_to_html(markdown).to_html(),
+            "<div><h1>A &amp; B</h1><p><a href=\"/?a=1&amp;b=2\">&lt; Back</a> "
+            "<code>&lt;br&gt;</code> and <b>x &gt; y</b></p>"
+            '<p>safe "quote"</p></div>',
+        )
+
+    @mock.patch("inline_markdown.MIN_CACHED_BLOCK", 0)
+    def test_markdown_to_html_block_cache(self):
+        markdown = "# Title\n\nShared **block**\n\n- a\n- b\n\nShared **block**"
+        cache = BlockCache()
+        expected = markdown_to_html(markdown).to_html()
+        self.assertEqual(markdown_to_html(markdown, cache=cache).to_html(), expected)
+        self.assertEqual(cache.take_stats(), {"hits": 1, "disk_hits": 0, "misses": 3})
+        self.assertEqual(markdown_to_html(markdown, cache=cache).to_html(), expected)
+        self.assertEqual(cache.take_stats(), {"hits": 4, "disk_hits": 0, "misses": 0})
+        resolved = markdown_to_html("[a](/a)", UrlResolver("/site/"), cache).to_html()
+        self.assertEqual(resolved, '<div><p><a href="/site/a">a</a></p></div>')
+        self.assertEqual(
+            markdown_to_html("[a](/a)", cache=cache).to_html(),
+            '<div><p><a href="/a">a</a></p></div>',
+        )
+
+    def test_markdown_to_html_string_matches_tree(self):
+        pages = [
+            "# A & B\n\n[< Back](/?a=1&b=2) `<br>` and **x > y**",
+            '![a "q" & <b>](/img.png) after\n\n> quoted *text*\n> more',
+            "```\ncode **bold**\n\nstill code\n```\n\n1. one\n2. _two_",
+            "- [x](/x)\n- plain\n\n###### deep `code`",
+        ]
+        urls = UrlResolver("/site/")
+        for markdown in pages:
+            plain_tree, plain_string = [], []
+            tree = markdown_to_html(markdown, urls, plain=plain_tree).to_html()
+            string = markdown_to_html_string(markdown, urls, plain=plain_string)
+            self.assertEqual(string, tree)
+            self.assertEqual(plain_string, plain_tree)
+
+    def test_markdown_to_html_string_errors(self):
+        for markdown in ["", "- a\n- ****", "[](/empty)", "**open"]:
+            with self.assertRaises(ValueError):
+                markdown_to_html(markdown).to_html()
+            with self.assertRaises(ValueError):
+                markdown_to_html_string(markdown)
+
+    def test_markdown_to_html_string_degrades(self):
+        errors, plain = [], []
+        html = markdown_to_html_string(
+            "# T\n\n- a\n- **b & c\n\n[](/x) ok", errors=errors, plain=plain
+        )
+        self.assertEqual(
+            html,
+            "<div><h1>T</h1><p>- a\n- **b &amp; c</p><p>[](/x) ok</p></div>",
+        )
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(plain, ["T", "- a\n- **b & c", "[](/x) ok"])
+        self.assertEqual(markdown_to_html_string("", errors=[]), "<div></div>")
+
+    def test_markdown_to_html_string_deadline(self):
+        with self.assertRaises(RenderTimeout):
+            markdown_to_html_string("a\n\nb", deadline=0)
+
+    def test_iter_markdown_html(self):
+        plain = []
+        fragments = iter_markdown_html("# A\n\n*b*\n\n- c", plain=plain)
+        self.assertEqual(next(fragments), "<div>")
+        self.assertEqual(next(fragments), "<h1>A</h1>")
+        self.assertEqual(plain, ["A"])
+        self.assertEqual(
+            list(fragments), ["<p><i>b</i></p>", "<ul><li>c</li></ul>", "</div>"]
+        )
+        self.assertEqual(plain, ["A", "b", "c"])
+        with self.assertRaises(ValueError):
+            list(iter_markdown_html(""))
+
+    @mock.patch("inline_markdown.MIN_CACHED_BLOCK", 0)
+    def test_markdown_to_html_string_block_cache(self):
+        markdown = "Shared **block**\n\n- a\n\nShared **block**"
+        cache = BlockCache()
+        expected = markdown_to_html(markdown).to_html()
+        self.assertEqual(markdown_to_html_string(markdown, cache=cache), expected)
+        self.assertEqual(cache.take_stats(), {"hits": 1, "disk_hits": 0, "misses": 2})
+        plain = []
+        markdown_to_html_string(markdown, cache=cache, plain=plain)
+        self.assertEqual(plain, ["Shared block", "a", "Shared block"])
+
+    def test_block_cache_skips_short_blocks(self):
+        long_block = "A **long** block. " * 8
+        markdown = f"Short\n\n{long_block}\n\n{long_block}"
+        cache = BlockCache()
+        self.assertEqual(
+            markdown_to_html_string(markdown, cache=cache),
+            markdown_to_html(markdown).to_html(),
+        )
+        self.assertEqual(cache.take_stats(), {"hits": 1, "disk_hits": 0, "misses": 1})
+
+
+def chained_text_to_textnodes(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+LEXER_CORPUS = [
+    "",
+    "plain text",
+    "This is text with a **bolded** word and **another**",
+    "**bold** and *italic*",
+    "This is text with a `code block` word",
+    "snake_case_name and __italics__ and _one_",
+    "This is **text** with an *italic* word and a `code block` and an ![image](https://i.imgur.com/zjjcJKZ.png) and a [link](https://boot.dev)",
+    "![image](https://www.example.COM/IMAGE.PNG)",
+    "![a](b)[c](d)!![e](f) ![g](h",
+    "**a [link](/x) inside** and `![not](code)`",
+    "[nested [brackets](/a)] and (parens [x](y(z)))",
+    "***both*** and ****",
+]
+
+
+class TestLexInline(unittest.TestCase):
+    def assertMatchesChained(self, text):
+        try:
+            expected = chained_text_to_textnodes(text)
+        except ValueError:
+            with self.assertRaises(ValueError):
+                list(lex_inline(text))
+            return
+        self.assertListEqual(list(lex_inline(text)), expected, text)
+
+    def test_matches_chained_pipeline(self):
+        for text in LEXER_CORPUS:
+            self.assertMatchesChained(text)
+
+    def test_matches_chained_pipeline_on_content(self):
+        root = os.path.join(os.path.dirname(__file__), "..", "content")
+        for path in glob.glob(os.path.join(root, "**", "*.md"), recursive=True):
+            with open(path) as f:
+                for block in markdown_to_blocks(f.read()):
+                    for line in block.split("\n"):
+                        self.assertMatchesChained(line)
+                    self.assertMatchesChained(block)
+
+    def test_unclosed_delimiter(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("an **unclosed bold")
+        with self.assertRaises(ValueError):
+            text_to_textnodes("an `unclosed code")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,74 @@
+import os
+import unittest
+
+from manifest import BuildManifest, file_hash, page_entry
+from testing import TempTreeTestCase
+
+
+class TestBuildManifest(TempTreeTestCase):
+    def test_path_for(self):
+        self.assertEqual(BuildManifest.path_for("docs"), ".docs-manifest.json")
+        self.assertEqual(
+            BuildManifest.path_for("out/docs/"),
+            os.path.join("out", ".docs-manifest.json"),
+        )
+
+    def test_dest_dir_for(self):
+        for dest_dir in ("docs", os.path.join("out", "docs")):
+            path = BuildManifest.path_for(dest_dir)
+            self.assertEqual(BuildManifest.dest_dir_for(path), dest_dir)
+        self.assertEqual(BuildManifest.dest_dir_for("out/manifest.json"), "out")
+
+    def test_file_hash(self):
+        a = self.write("a.md", "# A")
+        b = self.write("b.md", "# A")
+        c = self.write("c.md", "# C")
+        self.assertEqual(file_hash(a), file_hash(b))
+        self.assertNotEqual(file_hash(a), file_hash(c))
+
+    def test_is_fresh(self):
+        output = self.write("index.html", "<p>A</p>")
+        manifest = BuildManifest(os.path.join(self.root, "manifest.json"))
+        output = os.path.basename(output)
+        entry = page_entry("src", "t.html", "tpl", "/", output)
+        self.assertFalse(manifest.is_fresh("index.md", entry))
+        manifest.record("index.md", entry)
+        self.assertTrue(manifest.is_fresh("index.md", entry))
+        self.assertFalse(
+            manifest.is_fresh(
+                "index.md", page_entry("src", "t.html", "tpl2", "/", output)
+            )
+        )
+        self.assertFalse(
+            manifest.is_fresh(
+                "index.md", page_entry("src", "t.html", "tpl", "/blog/", output)
+            )
+        )
+        self.assertFalse(
+            manifest.is_fresh(
+                "index.md", page_entry("src", "t.html", "tpl", "/", output, [4])
+            )
+        )
+        os.remove(os.path.join(self.root, output))
+        self.assertFalse(manifest.is_fresh("index.md", entry))
+
+    def test_save_and_load(self):
+        path = os.path.join(self.root, "manifest.json")
+        manifest = BuildManifest(path)
+        manifest.record("a.md", page_entry("1", "t.html", "2", "/", "a.html"))
+        manifest.save()
+        self.assertEqual(BuildManifest.load(path).pages, manifest.pages)
+        self.assertEqual(BuildManifest.load(path + ".missing").pages, {})
+
+    def test_remove_stale(self):
+        manifest = BuildManifest(".docs-manifest.json")
+        manifest.record("a.md", page_entry("1", "t.html", "2", "/", "a.html"))
+        manifest.record("b.md", page_entry("1", "t.html", "2", "/", "b.html"))
+        self.assertEqual(
+            manifest.remove_stale({"a.md"}), [os.path.join("docs", "b.html")]
+        )
+        self.assertEqual(list(manifest.pages), ["a.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import types
+import unittest
+
+from profiling import NullProfiler, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_stages_are_exclusive(self):
+        profiler = Profiler()
+        with profiler.page("a.md"):
+            with profiler.stage("outer"):
+                with profiler.stage("inner"):
+                    sum(range(10000))
+        outer_calls, outer_ns, _ = profiler.stages["outer"]
+        inner_calls, inner_ns, _ = profiler.stages["inner"]
+        self.assertEqual((outer_calls, inner_calls), (1, 1))
+        self.assertLessEqual(outer_ns + inner_ns, profiler.pages["a.md"])
+        self.assertEqual(
+            [event["name"] for event in profiler.events], ["inner", "outer", "a.md"]
+        )
+        self.assertEqual(profiler.events[0]["args"]["page"], "a.md")
+
+    def test_instrument(self):
+        module = types.SimpleNamespace(double=lambda x: x * 2)
+        original = module.double
+        profiler = Profiler()
+        with profiler.instrument(module, "double"):
+            self.assertEqual(module.double(2), 4)
+            self.assertEqual(module.double(3), 6)
+        self.assertIs(module.double, original)
+        self.assertEqual(profiler.stages["double"][0], 2)
+        self.assertEqual(profiler.events, [])
+
+    def test_report_and_trace(self):
+        profiler = Profiler()
+        for path in ("a.md", "b.md"):
+            with profiler.page(path):
+                with profiler.stage("read"):
+                    pass
+        report = profiler.report(top=1)
+        self.assertIn("Slowest 1 pages:", report)
+        self.assertIn("read", report)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        self.assertEqual(len(trace["traceEvents"]), 4)
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+    def test_null_profiler(self):
+        profiler = NullProfiler()
+        self.assertFalse(profiler.enabled)
+        with profiler.page("a.md"), profiler.stage("read"):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
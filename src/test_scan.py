@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+from scan import scan_tree, tree_order
+from testing import TempTreeTestCase
+
+
+class TestScanTree(TempTreeTestCase):
+    def test_scan_tree(self):
+        md = os.stat(self.write(os.path.join("a", "b.md"), "# B"))
+        txt = os.stat(self.write("c.txt"))
+        self.assertEqual(
+            scan_tree(self.root),
+            {
+                os.path.join("a", "b.md"): [3, md.st_mtime_ns, md.st_ino],
+                "c.txt": [0, txt.st_mtime_ns, txt.st_ino],
+            },
+        )
+        self.assertEqual(list(scan_tree(self.root, ".md")), [os.path.join("a", "b.md")])
+        self.assertEqual(scan_tree(os.path.join(self.root, "missing")), {})
+
+    def test_deep_tree(self):
+        self.write(os.path.join(*["d"] * 200, "deep.md"))
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        try:
+            (rel_path,) = scan_tree(self.root)
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertEqual(rel_path.count(os.sep), 200)
+
+    def test_tree_order(self):
+        a_z, b_a = os.path.join("a", "z.md"), os.path.join("b", "a.md")
+        in_order = [a_z, "a.md", b_a, "i.md"]
+        self.assertEqual(sorted(reversed(in_order), key=tree_order), in_order)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import gzip
+import http.client
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from server import IMMUTABLE, SiteCache, SiteServer
+from testing import TempTreeTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestSiteServer(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = os.path.join(self.root, "docs")
+        self.content = os.path.join(self.root, "content")
+        self.template = self.write("template.html", TEMPLATE)
+        self.write("docs/index.html", "<p>home</p>" * 100)
+        self.write("docs/index.css", "body {}")
+        self.write("content/draft/index.md", "# Draft\n\nNot built yet")
+        cache = SiteCache(self.dest, self.content, self.template, "/site/")
+        self.server = SiteServer(("127.0.0.1", 0), cache)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path, headers=None):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=10)
+        try:
+            conn.request("GET", path, headers=headers or {})
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+    def test_etag_and_not_modified(self):
+        response, body = self.get("/site/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>home</p>" * 100)
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        etag = response.getheader("ETag")
+
+        response, body = self.get("/site/index.html", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+        self.write("docs/index.html", "<p>changed</p>")
+        response, body = self.get("/site/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>changed</p>")
+
+    def test_fingerprinted_assets(self):
+        self.write("docs/index.0123456789.css", "body {}")
+        self.write(
+            "docs/asset-manifest.json", '{"/index.css": "/index.0123456789.css"}'
+        )
+        self.write("template.html", '<link href="/index.css" />{{ Content }}')
+        self.server.cache = SiteCache(self.dest, self.content, self.template, "/site/")
+        response, body = self.get("/site/index.0123456789.css")
+        self.assertEqual(response.getheader("Cache-Control"), IMMUTABLE)
+        _, body = self.get("/site/draft/index.html")
+        self.assertIn(b'href="/site/index.0123456789.css"', body)
+
+    def test_gzip_variant(self):
+        response, body = self.get("/site/", {"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), b"<p>home</p>" * 100)
+        plain_etag = self.get("/site/")[0].getheader("ETag")
+        self.assertNotEqual(response.getheader("ETag"), plain_etag)
+
+        response, body = self.get("/site/index.css", {"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(response.getheader("Content-Type"), "text/css; charset=utf-8")
+
+    def test_precompressed_sibling(self):
+        with open(os.path.join(self.dest, "index.css.gz"), "wb") as f:
+            f.write(gzip.compress(b"body {}"))
+        response, body = self.get("/site/index.css", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), b"body {}")
+
+    def test_renders_unbuilt_pages(self):
+        response, body = self.get("/site/draft/")
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"<p>Not built yet</p>", body)
+
+        response, _ = self.get("/site/draft")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/site/draft/")
+
+        self.write("content/broken/index.md", "---\ntemplate: ../x.html\n---\n# X")
+        self.assertEqual(self.get("/site/broken/")[0].status, 500)
+
+    def test_renders_with_build_caches_configured(self):
+        from build import configure_caches, configure_limits, take_render_stats
+
+        configure_caches(10, None, os.path.join(self.root, "pages.sqlite"))
+        self.addCleanup(configure_caches)
+        configure_limits(1)
+        self.addCleanup(configure_limits)
+        self.write("content/untitled/index.md", "No heading")
+        response, body = self.get("/site/draft/")
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"<p>Not built yet</p>", body)
+        self.assertEqual(self.get("/site/untitled/")[0].status, 200)
+        self.assertEqual(take_render_stats(), {})
+
+    def test_not_found(self):
+        for path in ("/site/missing.html", "/site/../template.html", "/other/"):
+            self.assertEqual(self.get(path)[0].status, 404, path)
+
+    def test_concurrent_requests(self):
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            statuses = list(
+                executor.map(lambda _: self.get("/site/draft/")[0].status, range(300))
+            )
+        self.assertEqual(statuses, [200] * 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from build import BuildError, build_site
+from manifest import BuildManifest
+from shard import parse_shard, shard_dir, shard_of
+from testing import TempTreeTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestShard(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = self.write("template.html", TEMPLATE)
+        self.write("static/style.css", "body {}")
+        for i in range(12):
+            self.write(f"content/p{i}/index.md", f"# Page {i}\n\nText {i}")
+
+    def build(self, dest, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            build_site("/", self.content, self.static, self.template, dest, **kwargs)
+
+    def build_shards(self, count):
+        dirs = []
+        for index in range(1, count + 1):
+            dest = shard_dir((index, count), os.path.join(self.root, "shards"))
+            self.build(dest, shard=(index, count))
+            dirs.append(dest)
+        return dirs
+
+    def merge(self, shard_dirs, dest):
+        from shard import merge_shards
+
+        log = io.StringIO()
+        with redirect_stdout(log):
+            merge_shards(shard_dirs, dest, self.content, self.static)
+        return log.getvalue()
+
+    def read_tree(self, root):
+        files = {}
+        for dir_path, _, file_names in os.walk(root):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                with open(path) as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shard_of_is_relative_to_content(self):
+        self.assertEqual(
+            shard_of("a/content/x/index.md", "a/content", 7),
+            shard_of(os.path.join("b", "content", "x", "index.md"), "b/content", 7),
+        )
+        counts = [0] * 4
+        for i in range(400):
+            counts[shard_of(f"content/p{i}.md", "content", 4) - 1] += 1
+        self.assertTrue(all(count > 60 for count in counts), counts)
+
+    def test_merged_shards_match_full_build(self):
+        full = os.path.join(self.root, "full")
+        self.build(full)
+        shard_dirs = self.build_shards(3)
+        pages = [len(self.read_tree(d)) for d in shard_dirs]
+        self.assertEqual(sum(pages), 12)
+        merged = os.path.join(self.root, "docs")
+        self.assertIn("12 pages copied", self.merge(shard_dirs, merged))
+        self.assertEqual(self.read_tree(merged), self.read_tree(full))
+        self.assertIn("0 pages copied, 12 up to date", self.merge(shard_dirs, merged))
+
+    def test_merge_shards_moved_elsewhere(self):
+        import shutil
+
+        moved = []
+        for path in self.build_shards(2):
+            dest = os.path.join(self.root, "elsewhere", os.path.basename(path))
+            shutil.copytree(path, dest)
+            shutil.copy(
+                BuildManifest.path_for(path), BuildManifest.path_for(dest)
+            )
+            moved.append(dest)
+            shutil.rmtree(path)
+        merged = os.path.join(self.root, "docs")
+        self.assertIn("12 pages copied", self.merge(moved, merged))
+        self.assertEqual(len(self.read_tree(merged)), 13)
+
+        os.remove(os.path.join(moved[0], os.listdir(moved[0])[0], "index.html"))
+        with self.assertRaisesRegex(BuildError, "has no output in"):
+            self.merge(moved, merged)
+
+    def test_merge_removes_deleted_pages(self):
+        merged = os.path.join(self.root, "docs")
+        self.merge(self.build_shards(2), merged)
+        os.remove(os.path.join(self.content, "p3", "index.md"))
+        self.merge(self.build_shards(2), merged)
+        self.assertFalse(os.path.exists(os.path.join(merged, "p3")))
+
+    def test_merge_reports_missing_shard_and_pages(self):
+        shard_dirs = self.build_shards(3)
+        self.write("content/new.md", "# New")
+        merged = os.path.join(self.root, "docs")
+        with self.assertRaisesRegex(BuildError, "shard 2/3 is missing"):
+            self.merge([shard_dirs[0], shard_dirs[2]], merged)
+        with self.assertRaisesRegex(BuildError, "new.md was not built by any shard"):
+            self.merge(shard_dirs, merged)
+        self.assertFalse(os.path.exists(merged))
+
+    def test_merge_reports_collisions(self):
+        self.write("static/p1/index.html", "<p>static</p>")
+        with self.assertRaisesRegex(BuildError, "both write p1/index.html"):
+            self.merge(self.build_shards(2), os.path.join(self.root, "docs"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import unittest
+
+from site_index import SiteIndex, page_url
+from testing import TempTreeTestCase
+
+
+class TestSiteIndex(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = os.path.join(self.root, "docs")
+        self.index = SiteIndex(SiteIndex.path_for(self.dest), self.dest)
+
+    def tearDown(self):
+        self.index.close()
+
+    def add(self, rel_path, title, text):
+        src_path = os.path.join(self.root, rel_path + ".md")
+        os.makedirs(os.path.dirname(src_path), exist_ok=True)
+        with open(src_path, "w") as f:
+            f.write(text)
+        dest_path = os.path.join(self.dest, rel_path + ".html")
+        self.index.add(src_path, dest_path, title, text)
+        return src_path
+
+    def test_path_for(self):
+        self.assertEqual(
+            SiteIndex.path_for("out/docs/"), os.path.join("out", ".docs-index.sqlite")
+        )
+
+    def test_page_url(self):
+        self.assertEqual(page_url("docs/index.html", "docs"), "/")
+        self.assertEqual(
+            page_url("docs/blog/a/index.html", "docs", "/s/"), "/s/blog/a/"
+        )
+        self.assertEqual(page_url("docs/notes.html", "docs"), "/notes.html")
+
+    def test_search_index(self):
+        self.add("index", "Home", "The ring\nthe road")
+        self.add("blog/ring/index", "Ring", "One ring")
+        data = json.loads("".join(self.index.iter_search_index()))
+        self.assertEqual(
+            data["pages"], [["/", "Home", 4], ["/blog/ring/", "Ring", 2]]
+        )
+        self.assertEqual(data["terms"]["ring"], [0, 1, 1, 1])
+        self.assertEqual(data["terms"]["the"], [0, 2])
+        self.assertEqual(sorted(data["terms"]), ["one", "ring", "road", "the"])
+
+    def test_readding_and_retain(self):
+        home = self.add("index", "Home", "old words")
+        self.add("other", "Other", "words")
+        self.add("index", "Home", "new")
+        self.index.retain({home})
+        data = json.loads("".join(self.index.iter_search_index()))
+        self.assertEqual(data, {"pages": [["/", "Home", 1]], "terms": {"new": [0, 1]}})
+        self.assertTrue(self.index.has(home))
+
+    def test_sitemap(self):
+        self.add("index", "Home", "")
+        self.add("a&b", "A", "")
+        sitemap = "".join(self.index.iter_sitemap("https://example.com"))
+        self.assertIn("<loc>https://example.com/</loc>", sitemap)
+        self.assertIn("<loc>https://example.com/a&amp;b.html</loc>", sitemap)
+
+    def test_listings(self):
+        self.add("index", "Home", "")
+        self.add("blog/a/index", "A", "")
+        self.add("blog/b/index", "B", "")
+        self.add("docs/api/x/index", "X", "")
+        self.assertEqual(
+            self.index.listings(),
+            {
+                "/blog/": [("/blog/a/", "A"), ("/blog/b/", "B")],
+                "/docs/": [("/docs/api/", "api")],
+                "/docs/api/": [("/docs/api/x/", "X")],
+            },
+        )
+        self.assertEqual(
+            self.index.listing_output("/blog/"),
+            os.path.join(self.dest, "blog", "index.html"),
+        )
+
+    def test_replace_listings(self):
+        self.add("blog/index", "Blog", "")
+        self.assertEqual(self.index.replace_listings(["/blog/", "/old/"]), [])
+        self.assertEqual(self.index.replace_listings(["/blog/"]), ["/old/"])
+        self.add("old/index", "Old", "")
+        self.index.replace_listings(["/old/"])
+        self.assertEqual(self.index.replace_listings([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
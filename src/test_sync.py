@@ -0,0 +1,70 @@
+import os
+import unittest
+
+from sync import copy_file, sync_tree
+from testing import TempTreeTestCase
+
+
+class TestSyncTree(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = os.path.join(self.root, "static")
+        self.dst = os.path.join(self.root, "docs")
+
+    def test_copies_only_changes(self):
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png")
+        assets, counts = sync_tree(self.src, self.dst)
+        self.assertEqual(counts, (2, 0, 0))
+        self.assertEqual(sorted(assets), ["images/a.png", "index.css"])
+        self.assertEqual(self.read(os.path.join(self.dst, "images", "a.png")), "png")
+
+        assets, counts = sync_tree(self.src, self.dst, assets)
+        self.assertEqual(counts, (0, 2, 0))
+
+        self.write(os.path.join(self.src, "index.css"), "body { margin: 0 }")
+        assets, counts = sync_tree(self.src, self.dst, assets)
+        self.assertEqual(counts, (1, 1, 0))
+        self.assertEqual(
+            self.read(os.path.join(self.dst, "index.css")), "body { margin: 0 }"
+        )
+
+    def test_checksum(self):
+        src_path = os.path.join(self.src, "index.css")
+        dst_path = os.path.join(self.dst, "index.css")
+        self.write(src_path, "aaaa")
+        assets, _ = sync_tree(self.src, self.dst)
+        self.write(dst_path, "bbbb")
+        os.utime(dst_path, ns=(0, os.stat(src_path).st_mtime_ns))
+        self.assertEqual(sync_tree(self.src, self.dst, assets)[1], (0, 1, 0))
+        self.assertEqual(
+            sync_tree(self.src, self.dst, assets, checksum=True)[1], (1, 0, 0)
+        )
+        self.assertEqual(self.read(dst_path), "aaaa")
+
+    def test_prunes_only_previously_synced_files(self):
+        self.write(os.path.join(self.src, "old.css"), "old")
+        self.write(os.path.join(self.src, "a", "b", "old.png"), "png")
+        self.write(os.path.join(self.src, "c", "old.png"), "png")
+        assets, _ = sync_tree(self.src, self.dst)
+        self.write(os.path.join(self.dst, "index.html"), "<p>page</p>")
+        self.write(os.path.join(self.dst, "c", "index.html"), "<p>page</p>")
+        for rel_path in ("old.css", "a/b/old.png", "c/old.png"):
+            os.remove(os.path.join(self.src, rel_path))
+        _, counts = sync_tree(self.src, self.dst, assets)
+        self.assertEqual(counts, (0, 0, 3))
+        self.assertEqual(sorted(os.listdir(self.dst)), ["c", "index.html"])
+        self.assertEqual(os.listdir(os.path.join(self.dst, "c")), ["index.html"])
+
+    def test_copy_file_link(self):
+        src_path = os.path.join(self.src, "a.png")
+        dst_path = os.path.join(self.dst, "images", "a.png")
+        self.write(src_path, "png")
+        copy_file(src_path, dst_path, link=True)
+        self.assertEqual(self.read(dst_path), "png")
+        self.assertEqual(os.stat(dst_path).st_mtime_ns, os.stat(src_path).st_mtime_ns)
+        self.assertFalse(os.path.exists(dst_path + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
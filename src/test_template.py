@@ -0,0 +1,79 @@
+import io
+import os
+import tempfile
+import unittest
+
+from template import Template, load_template
+from urls import UrlResolver
+
+
+class TestTemplate(unittest.TestCase):
+    def test_parse(self):
+        template = Template("<title>{{ Title }}</title><p>{{Content}}</p>")
+        self.assertEqual(
+            template.segments, ["<title>", "Title", "</title><p>", "Content", "</p>"]
+        )
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title>{{ Content }}{{ Missing }}")
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": iter(["<p>", "x", "</p>"])}),
+            "<title>Hi</title><p>x</p>{{ Missing }}",
+        )
+        fp = io.StringIO()
+        template.write(fp, {"Title": "Hi", "Content": "body"})
+        self.assertEqual(fp.getvalue(), "<title>Hi</title>body{{ Missing }}")
+
+    def test_resolve_urls_only_touches_template(self):
+        template = Template(
+            '<link href="/index.css" /><img src="https://x.com/a.png">{{ Content }}'
+        ).resolve_urls(UrlResolver("/site/"))
+        self.assertEqual(
+            template.render({"Content": '<code>href="/raw"</code>'}),
+            '<link href="/site/index.css" /><img src="https://x.com/a.png">'
+            '<code>href="/raw"</code>',
+        )
+
+
+class TestLoadTemplate(unittest.TestCase):
+    def test_cached_until_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("<p>{{ Content }}</p>")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+            self.assertIsNot(load_template(path, UrlResolver("/site/")), first)
+
+            with open(path, "w") as f:
+                f.write("<div>{{ Content }}</div>")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            self.assertEqual(
+                load_template(path).render({"Content": "x"}), "<div>x</div>"
+            )
+
+
+class TestUrlResolver(unittest.TestCase):
+    def test_resolve(self):
+        urls = UrlResolver("/site/")
+        self.assertEqual(urls("/images/a.png"), "/site/images/a.png")
+        self.assertEqual(urls("https://example.com/"), "https://example.com/")
+        self.assertEqual(urls("//cdn.example.com/a.js"), "//cdn.example.com/a.js")
+        self.assertEqual(urls("#top"), "#top")
+        self.assertEqual(UrlResolver()("/a"), "/a")
+
+    def test_assets(self):
+        assets = {"/index.css": "/index.0123456789.css"}
+        urls = UrlResolver("/site/", assets)
+        self.assertEqual(urls("/index.css"), "/site/index.0123456789.css")
+        self.assertEqual(urls("/index.css?v=1#x"), "/site/index.0123456789.css?v=1#x")
+        self.assertEqual(urls("/other.css"), "/site/other.css")
+        self.assertNotEqual(urls.key, UrlResolver("/site/").key)
+        self.assertEqual(urls.key, UrlResolver("/site/", dict(assets)).key)
+        self.assertEqual(UrlResolver("/site/", {}).key, "/site/")
+
+
+if __name__ == "__main__":
+    unittest.main()
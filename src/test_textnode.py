@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from textnode import TextNode, TextType
@@ -17,6 +18,14 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.ITALIC)
         self.assertNotEqual(node, node2)
 
+    def test_compact(self):
+        node = TextNode("This is a link node", TextType.LINK, "https://www.example.com")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(node)), node)
+        self.assertEqual(
+            repr(node), "TextNode(This is a link node, link, https://www.example.com)"
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
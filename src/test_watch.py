@@ -0,0 +1,100 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from testing import TempTreeTestCase
+from watch import DependencyGraph, Watcher
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_pages_using(self):
+        graph = DependencyGraph()
+        graph.set_page("a.md", "a.html", "template.html")
+        graph.set_page("b.md", "b.html", "post.html")
+        graph.set_page("c.md", "c.html", "template.html")
+        self.assertEqual(graph.pages_using("template.html"), ["a.md", "c.md"])
+        graph.set_page("c.md", "c.html", "post.html")
+        self.assertEqual(graph.pages_using("template.html"), ["a.md"])
+        self.assertEqual(graph.remove_page("a.md"), "a.html")
+        self.assertEqual(graph.pages_using("template.html"), [])
+        self.assertEqual(graph.pages_using("post.html"), ["b.md", "c.md"])
+
+
+class TestWatcher(TempTreeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("template.html", "<main>{{ Content }}</main>")
+        self.write("post.html", "<article>{{ Content }}</article>")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/index.md", "---\ntemplate: post.html\n---\n# Blog")
+        self.write("static/index.css", "body {}")
+        self.watcher = Watcher(
+            "/",
+            self.path("content"),
+            self.path("static"),
+            self.path("template.html"),
+            self.path("docs"),
+        )
+
+    def poll(self):
+        with redirect_stdout(io.StringIO()):
+            outputs = self.watcher.poll()
+        return sorted(os.path.relpath(path, self.path("docs")) for path in outputs)
+
+    def test_no_changes(self):
+        self.assertEqual(self.poll(), [])
+
+    def test_content_edit_rebuilds_page(self):
+        self.write("content/index.md", "# Home again", touch=True)
+        self.assertEqual(self.poll(), ["index.html"])
+        with open(self.path("docs/index.html")) as f:
+            self.assertEqual(f.read(), "<main><div><h1>Home again</h1></div></main>")
+
+    def test_template_edit_rebuilds_dependents(self):
+        self.write("post.html", "<section>{{ Content }}</section>", touch=True)
+        self.assertEqual(self.poll(), [os.path.join("blog", "index.html")])
+        self.write(
+            "content/index.md", "---\ntemplate: post.html\n---\n# Home", touch=True
+        )
+        self.assertEqual(self.poll(), ["index.html"])
+        self.write("post.html", "<aside>{{ Content }}</aside>", touch=True)
+        self.assertEqual(
+            self.poll(), [os.path.join("blog", "index.html"), "index.html"]
+        )
+
+    def test_added_and_removed_files(self):
+        self.write("content/new/index.md", "# New")
+        self.write("static/images/a.png", "png")
+        self.assertEqual(
+            self.poll(),
+            [os.path.join("images", "a.png"), os.path.join("new", "index.html")],
+        )
+        os.remove(self.path("content/new/index.md"))
+        os.remove(self.path("static/images/a.png"))
+        self.assertEqual(
+            self.poll(),
+            [os.path.join("images", "a.png"), os.path.join("new", "index.html")],
+        )
+        self.assertFalse(os.path.exists(self.path("docs/new/index.html")))
+        self.assertFalse(os.path.exists(self.path("docs/images/a.png")))
+
+    def test_file_errors_do_not_stop_watching(self):
+        self.write("content/new/index.md", "# New")
+        self.poll()
+        self.watcher.graph.remove_page(self.path("content/new/index.md"))
+        os.remove(self.path("content/new/index.md"))
+        self.assertEqual(self.poll(), [])
+
+        self.write("static/a.css", "a {}")
+        self.write("static/b.css", "b {}")
+        error = FileNotFoundError("gone")
+        with mock.patch("watch.copy_file", side_effect=[error, None]):
+            self.assertEqual(self.poll(), ["b.css"])
+        self.write("content/index.md", "# Home again", touch=True)
+        self.assertEqual(self.poll(), ["index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
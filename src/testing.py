@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+
+class TempTreeTestCase(unittest.TestCase):
+    """A test case that works in a fresh temporary directory, `self.root`,
+    removed after the test and any tearDown of a subclass."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def write(self, path, data="", touch=False):
+        """Write text or bytes to `path`, taken relative to the root unless
+        absolute, creating its directories; return the full path.
+
+        With `touch`, an existing file's mtime is moved 1 ms past its old
+        one, so that the change is seen on filesystems with coarse mtimes.
+        """
+        path = self.path(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mtime = os.stat(path).st_mtime_ns if touch and os.path.exists(path) else None
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        if mtime is not None:
+            os.utime(path, ns=(mtime + 1_000_000, mtime + 1_000_000))
+        return path
+
+    def read(self, path):
+        with open(self.path(path)) as f:
+            return f.read()
@@ -0,0 +1,43 @@
+import hashlib
+
+
+class UrlResolver:
+    """Maps site-absolute URLs in generated markup onto the deployed site.
+
+    `assets` optionally maps site paths of static files, such as
+    `/index.css`, onto their fingerprinted copies. `key` identifies the
+    mapping so cached output can be keyed on it.
+    """
+
+    def __init__(self, basepath: str = "/", assets: dict | None = None):
+        self.basepath = basepath
+        self.assets = assets or {}
+        self._key = basepath
+        if self.assets:
+            digest = hashlib.blake2b(digest_size=8)
+            for path, target in sorted(self.assets.items()):
+                digest.update(f"{path}\0{target}\0".encode("utf-8"))
+            self._key = f"{basepath}#{digest.hexdigest()}"
+
+    @property
+    def key(self):
+        return self._key
+
+    def __call__(self, url: str):
+        if url.startswith("/") and not url.startswith("//"):
+            if self.assets:
+                url = self.fingerprint(url)
+            return self.basepath + url[1:]
+        return url
+
+    def fingerprint(self, url):
+        end = len(url)
+        for mark in "?#":
+            index = url.find(mark)
+            if index != -1:
+                end = min(end, index)
+        target = self.assets.get(url[:end])
+        return url if target is None else target + url[end:]
+
+    def __repr__(self):
+        return f"UrlResolver(basepath={self.basepath})"
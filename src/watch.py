@@ -0,0 +1,186 @@
+import os
+import time
+from build import (
+    generate_page,
+    page_template_path,
+    remove_output,
+    split_front_matter,
+)
+from compress import remove_sibling
+from scan import scan_tree
+from sync import copy_file, remove_empty_dirs
+
+
+class DependencyGraph:
+    """Tracks which outputs each watched input feeds into."""
+
+    def __init__(self):
+        self.page_outputs = {}
+        self.page_templates = {}
+        self.template_pages = {}
+
+    def set_page(self, src_path, dest_path, template_path):
+        self.remove_page(src_path)
+        self.page_outputs[src_path] = dest_path
+        self.page_templates[src_path] = template_path
+        self.template_pages.setdefault(template_path, set()).add(src_path)
+
+    def remove_page(self, src_path):
+        template_path = self.page_templates.pop(src_path, None)
+        if template_path is not None:
+            pages = self.template_pages[template_path]
+            pages.discard(src_path)
+            if not pages:
+                del self.template_pages[template_path]
+        return self.page_outputs.pop(src_path, None)
+
+    def pages_using(self, template_path):
+        return sorted(self.template_pages.get(template_path, ()))
+
+
+def snapshot_tree(root, suffix=""):
+    return {
+        os.path.join(root, rel_path): mtime_ns
+        for rel_path, (_, mtime_ns, _) in scan_tree(root, suffix).items()
+    }
+
+
+def diff_snapshots(old, new):
+    changed = sorted(path for path, mtime in new.items() if old.get(path) != mtime)
+    removed = sorted(path for path in old if path not in new)
+    return changed, removed
+
+
+class Watcher:
+    """Polls content, static files and templates and rebuilds affected outputs.
+
+    A content edit regenerates that page, a template edit regenerates the pages
+    using that template and a static edit copies that one file.
+    """
+
+    def __init__(
+        self,
+        basepath,
+        content_dir="content",
+        static_dir="static",
+        template_path="template.html",
+        dest_dir="docs",
+        interval=0.2,
+    ):
+        self.basepath = basepath
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.dest_dir = dest_dir
+        self.interval = interval
+        self.graph = DependencyGraph()
+        self.content = snapshot_tree(content_dir, ".md")
+        self.static = snapshot_tree(static_dir)
+        for src_path in self.content:
+            self.graph.set_page(
+                src_path, self.page_dest(src_path), self.read_page_template(src_path)
+            )
+        self.templates = self.snapshot_templates()
+
+    def page_dest(self, src_path):
+        rel_path = os.path.relpath(src_path, self.content_dir)
+        return os.path.join(self.dest_dir, os.path.splitext(rel_path)[0] + ".html")
+
+    def static_dest(self, src_path):
+        return os.path.join(self.dest_dir, os.path.relpath(src_path, self.static_dir))
+
+    def read_page_template(self, src_path):
+        with open(src_path, "r") as f:
+            meta = split_front_matter(f.read())[0]
+        try:
+            return page_template_path(meta, self.template_path)
+        except ValueError:
+            # Rendering reports the error; the page still depends on its source.
+            return self.template_path
+
+    def snapshot_templates(self):
+        mtimes = {}
+        for path in {self.template_path, *self.graph.template_pages}:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def poll(self):
+        """Rebuild whatever changed since the last poll and return the outputs."""
+        content = snapshot_tree(self.content_dir, ".md")
+        static = snapshot_tree(self.static_dir)
+        changed_pages, removed_pages = diff_snapshots(self.content, content)
+        changed_static, removed_static = diff_snapshots(self.static, static)
+        self.content, self.static = content, static
+
+        outputs = []
+        for src_path in removed_pages:
+            dest_path = self.graph.remove_page(src_path)
+            if dest_path is None:
+                continue
+            try:
+                remove_output(dest_path, self.dest_dir)
+            except OSError as e:
+                print(f"error: Failed to remove {dest_path}: {e}")
+                continue
+            outputs.append(dest_path)
+
+        dirty_pages = set(changed_pages)
+        for src_path in changed_pages:
+            try:
+                template_path = self.read_page_template(src_path)
+            except OSError:
+                dirty_pages.discard(src_path)
+                continue
+            self.graph.set_page(src_path, self.page_dest(src_path), template_path)
+
+        templates = self.snapshot_templates()
+        changed_templates, _ = diff_snapshots(self.templates, templates)
+        self.templates = templates
+        for template_path in changed_templates:
+            dirty_pages.update(self.graph.pages_using(template_path))
+
+        for src_path in sorted(dirty_pages):
+            dest_path = self.graph.page_outputs[src_path]
+            try:
+                generate_page(self.basepath, src_path, self.template_path, dest_path)
+            except Exception as e:
+                print(f"error: Failed to generate page from {src_path}: {e}")
+                continue
+            outputs.append(dest_path)
+
+        for src_path in changed_static:
+            dest_path = self.static_dest(src_path)
+            try:
+                copy_file(src_path, dest_path)
+                if src_path + ".gz" not in static:
+                    remove_sibling(dest_path)
+            except OSError as e:
+                # Gone since the snapshot or unreadable; a removal shows up in
+                # the next poll.
+                print(f"error: Failed to copy {src_path}: {e}")
+                continue
+            outputs.append(dest_path)
+        for src_path in removed_static:
+            dest_path = self.static_dest(src_path)
+            try:
+                if os.path.exists(dest_path):
+                    os.remove(dest_path)
+                    remove_empty_dirs([dest_path], self.dest_dir)
+            except OSError as e:
+                print(f"error: Failed to remove {dest_path}: {e}")
+                continue
+            outputs.append(dest_path)
+        return outputs
+
+    def run(self):
+        print(f"Watching {self.content_dir}, {self.static_dir} and templates")
+        while True:
+            time.sleep(self.interval)
+            start = time.perf_counter()
+            outputs = self.poll()
+            if outputs:
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"Rebuilt {len(outputs)} outputs in {elapsed:.1f} ms")